@@ -1,9 +1,20 @@
 import math
 import random
+import numpy as np
+
+# The number of ages in the table of age factors; it is extended for older animals
+AGE_TABLE_SIZE = 100
 
 
 class Animal:
-    """A class with the common traits of Herbivores and Carnivores"""
+    """
+    A class with the common traits of Herbivores and Carnivores. The animals only store their
+    age, weight, fitness and flags in fixed slots; the parameters belong to the species.
+    """
+    __slots__ = ('age', 'weight', 'fitness', 'fitness_update', 'dead')
+    age_table = []
+    age_table_array = np.empty(0)
+
     def update_fitness(self):
         r"""
         A function that updates the fitness of an animal. It is called before it is
@@ -22,13 +33,113 @@ class Animal:
 
         formula above
 
+        The fitness is calculated by fitness_of.
         """
         if self.fitness_update:
-            self.fitness = 0 if self.weight <= 0 \
-                else (1 / (1 + math.exp(self.phi_age * (self.age - self.a_half)))) * \
-                     (1 / (1 + math.exp(-self.phi_weight * (self.weight - self.w_half))))
+            self.fitness = self.fitness_of(self.age, self.weight)
             self.fitness_update = False
 
+    @classmethod
+    def fitness_of(cls, age, weight):
+        """
+        A function that calculates the fitness of one animal of the species from its age and
+        weight, see update_fitness. The age factor is looked up in the age_table of the
+        species, and other ages are handled by age_factors.
+
+        :param age: the age of the animal
+        :type age: int
+        :param weight: the weight of the animal
+        :type weight: float
+        :return: the fitness
+        :rtype: float
+        """
+        if weight <= 0:
+            return 0
+        if isinstance(age, int) and 0 <= age < len(cls.age_table):
+            age_factor = cls.age_table[age]
+        else:
+            age_factor = float(cls.age_factors(np.array([age]))[0])
+        return age_factor * (1 / (1 + math.exp(-cls.phi_weight * (weight - cls.w_half))))
+
+    @classmethod
+    def build_age_table(cls, size=AGE_TABLE_SIZE):
+        """
+        A function that calculates the age factor of the fitness,
+        1 / (1 + exp(phi_age * (age - a_half))), for the ages 0 to size - 1. It is called when
+        the parameters of the species change, and when an animal is older than the table.
+
+        :param size: the number of ages in the table
+        :type size: int
+        """
+        table = []
+        for age in range(size):
+            exponent = cls.phi_age * (age - cls.a_half)
+            table.append(1 / (1 + math.exp(exponent)) if exponent < 700 else 0.0)
+        # The array is replaced first, so it always covers the ages in the list
+        cls.age_table_array = np.array(table)
+        cls.age_table = table
+
+    @classmethod
+    def age_factors(cls, ages):
+        """
+        A function that looks up the age factor of the fitness for many animals, so batched
+        code can use the table as well. The table is extended if it does not cover the ages.
+        Ages that are not whole numbers, or are negative, are calculated with the formula.
+
+        :param ages: the ages of the animals
+        :type ages: numpy array
+        :return: the age factor of every animal
+        :rtype: numpy array
+        """
+        ages = np.asarray(ages)
+        if not np.issubdtype(ages.dtype, np.integer):
+            with np.errstate(over='ignore'):
+                return 1 / (1 + np.exp(cls.phi_age * (ages - cls.a_half)))
+        if ages.size and ages.max() >= len(cls.age_table):
+            cls.build_age_table(max(2 * len(cls.age_table), int(ages.max()) + 1))
+        if ages.size and ages.min() < 0:
+            return np.where(ages < 0, cls.age_factors(ages.astype(float)),
+                            cls.age_table_array[np.maximum(ages, 0)])
+        return cls.age_table_array[ages]
+
+    @classmethod
+    def fitness_array(cls, ages, weights):
+        """
+        A function that calculates the fitness of many animals of the same species, with the
+        same values as fitness_of. The age factors are looked up in one NumPy call, and the
+        weight factors use math.exp as fitness_of does, since np.exp may differ from it in
+        the last bit.
+
+        :param ages: the ages of the animals
+        :type ages: list or numpy array
+        :param weights: the weights of the animals
+        :type weights: list or numpy array
+        :return: the fitness of every animal
+        :rtype: numpy array
+        """
+        age_factor = cls.age_factors(np.asarray(ages))
+        phi_weight, w_half = cls.phi_weight, cls.w_half
+        weight_factor = np.array([1 / (1 + math.exp(-phi_weight * (weight - w_half)))
+                                  if weight > 0 else 0.0
+                                  for weight in np.asarray(weights, dtype=float).tolist()])
+        return age_factor * weight_factor
+
+    @classmethod
+    def update_fitness_batch(cls, animals):
+        """
+        A function that updates the fitness of all animals in a list that needs it. Only
+        the animals with fitness_update set are recalculated, in one pass with fitness_of,
+        so the fitness of an animal does not depend on the other animals in the list.
+
+        :param animals: animals of the species
+        :type animals: list
+        """
+        fitness_of = cls.fitness_of
+        for ani in animals:
+            if ani.fitness_update:
+                ani.fitness = fitness_of(ani.age, ani.weight)
+                ani.fitness_update = False
+
     def losing_weight(self):
         """
         A function that updates the weight of an animal.
@@ -43,18 +154,42 @@ class Animal:
         self.age += 1
         self.fitness_update = True
 
-    def migrate(self):
+    def update_age_and_weight(self):
+        """
+        A function that updates the age and the weight of an animal at the end of the year,
+        in the same way as update_age followed by losing_weight.
+        """
+        self.age += 1
+        self.weight -= self.eta * self.weight
+        self.fitness_update = True
+
+    def migrate(self, rng=random):
         """
         A function that tells if an animal is going to migrate any given years
 
+        :param rng: the random number generator, the global random module by default
+        :type rng: random.Random
         :return: bool
         :rtype: True or False
         """
-        if self.mu * self.fitness >= random.random():
+        if self.mu * self.fitness >= rng.random():
             return True
         else:
             return False
 
+    def birth_probability(self, num_animals):
+        """
+        A function that calculates the probability that an animal gives birth.
+
+        :param num_animals: the number of animals of the species in the tile
+        :type num_animals: int
+        :return: the probability
+        :rtype: float
+        """
+        if self.weight < self.zeta * (self.w_birth + self.sigma_birth):
+            return 0
+        return min(1, self.gamma * self.fitness * (num_animals - 1))
+
     def eat(self, amount):
         """
         Updates the weight of the animal
@@ -73,6 +208,7 @@ class Herbivore(Animal):
     A class for the Herbivore-species. They will act as the food-source for the Carnivores,
     and will act according to their parameters and specifications.
     """
+    __slots__ = ()
     a_half = 40
     w_half = 10
     phi_age = 0.6
@@ -103,26 +239,6 @@ class Herbivore(Animal):
                       'F': F,
                       'mu': mu}
 
-    instance_count = 0
-
-    @classmethod
-    def count_animals(cls):
-        """
-        A class method that updates the number of instances of the Herbivore species.
-        The instance_count is used to track the number of animals currently on the
-        island. It is called at "birth" or at the creation of an animal.
-        """
-        cls.instance_count += 1
-
-    @classmethod
-    def remove_animals(cls):
-        """
-        A class method that updates the number of instances of Herbivore.
-        The instance_count is used to track the number of animals currently on the
-        Island. It is called at the death of an animal.
-        """
-        cls.instance_count -= 1
-
     @classmethod
     def set_params(cls, new_params):
         """
@@ -163,13 +279,7 @@ class Herbivore(Animal):
             cls.F = new_params['F']
         if 'mu' in new_params:
             cls.mu = new_params['mu']
-
-    @classmethod
-    def disp_herbs(cls):
-        """
-        A classmethod that prints the current number of Herbivores on the island
-        """
-        print('number of herbivores:', cls.instance_count)
+        cls.build_age_table()
 
     def __init__(self, weight, age):
         """
@@ -178,41 +288,39 @@ class Herbivore(Animal):
         :param age: age of the animal (0 at birth)
         :type age: int
         """
-        self.count_animals()
         self.dead = False
         self.weight = weight
         self.age = age
-        self.fitness = 0 if self.weight <= 0 else \
-            (1 / (1 + math.exp(self.phi_age * (self.age - self.a_half)))) * \
-            (1 / (1 + math.exp(-self.phi_weight * (self.weight - self.w_half))))
-        self.fitness_update = False
+        self.fitness_update = True
+        self.update_fitness()
 
-    def herb_birth(self, num_herb):
+    def herb_birth(self, num_herb, rng=random):
         """
         A function for herbivores giving birth
         :param num_herb: number of herbivores in a tile/cell
+        :param rng: the random number generator, the global random module by default
+        :type rng: random.Random
 
         :return: Herbivore or None
         """
-        self.prob = 0 if self.weight < self.zeta * (self.w_birth + self.sigma_birth)\
-            else min(1, self.gamma * self.fitness * (num_herb - 1))
-        if self.prob > random.random():
-            new_weight = random.gauss(self.w_birth, self.sigma_birth)
+        if self.birth_probability(num_herb) > rng.random():
+            new_weight = rng.gauss(self.w_birth, self.sigma_birth)
             if new_weight > 0:
                 self.weight -= self.xi * new_weight
                 self.fitness_update = True
                 return Herbivore(new_weight, 0)
 
-    def death(self):
+    def death(self, rng=random):
         """
         A function for calculating if a herbivore dies
 
+        :param rng: the random number generator, the global random module by default
+        :type rng: random.Random
         :return self.dead:
         :rtype: True or False
         """
-        if self.weight <= 0 or random.random() < self.omega * (1 - self.fitness):
+        if self.weight <= 0 or rng.random() < self.omega * (1 - self.fitness):
             self.dead = True
-            self.remove_animals()
         return self.dead
 
 
@@ -221,6 +329,7 @@ class Carnivore(Animal):
     A class for the Carnivore-species. They will act as the hunter on the island,
     and will act according to their parameters and specifications. It will only eat Herbivores
     """
+    __slots__ = ()
     beta = 0.75
     eta = 0.125
     a_half = 40
@@ -253,14 +362,12 @@ class Carnivore(Animal):
                       'sigma_birth': sigma_birth,
                       'w_birth': w_birth}
 
-    instance_count = 0
-
     @classmethod
     def set_params(cls, new_params):
         """
-        A class method that updates the number of instances of the Carnivore species.
-        The instance_count is used to track the number of animals currently on the
-        island. It is called at "birth" or at the creation of an animal.
+        :param new_params: dict of new parameters e.g {param:value}
+        :type dict: {str:float}
+        :raise KeyError:
         """
         for key in new_params:
             if key not in ('beta', 'eta', 'a_half', 'phi_age', 'w_half', 'phi_weight', 'mu',
@@ -296,27 +403,7 @@ class Carnivore(Animal):
             cls.F = new_params['F']
         if 'DeltaPhiMax' in new_params:
             cls.DeltaPhiMax = new_params['DeltaPhiMax']
-
-    @classmethod
-    def disp_carns(cls):
-        """
-        A function for printing the number of carnivores on the island.
-        """
-        print('number of herbivores:', cls.instance_count)
-
-    @classmethod
-    def count_animals(cls):
-        """A class method that updates the number of instances of a species (Herbivore or
-           Carnivore). The instance_count is used to track the number of animals currently in
-           "existence". It is called at "birth" or at the creation of an animal."""
-        cls.instance_count += 1
-
-    @classmethod
-    def remove_animals(cls):
-        """A class method that updates the number of instances of a species (Herbivore or
-        Carnivore). The instance_count is used to track the number of animals currently in
-        "existence". It is called at the "death" of an animal."""
-        cls.instance_count -= 1
+        cls.build_age_table()
 
     def __init__(self, weight, age):
         """
@@ -325,58 +412,62 @@ class Carnivore(Animal):
         :param age: age of the animal (0 at birth)
         :type age: int
         """
-        self.count_animals()
         self.dead = False
         self.weight = weight
         self.age = age
-        self.fitness = 0 if self.weight <= 0 else 1 / (1 + math.exp(self.phi_age * (self.age - self.a_half))) * \
-                                                  1 / (1 + math.exp(-self.phi_weight * (self.weight - self.w_half)))
-        self.fitness_update = False
+        self.fitness_update = True
+        self.update_fitness()
 
-    def herb_killed(self, herb_fitness):
+    def herb_killed(self, herb_fitness, rng=random):
         """
         A funtction that calculates whether or not a Carnivore will kill (and later eat)
         a Herbivore.
 
         :param herb_fitness: the fitness of the Herbivore in question
+        :param rng: the random number generator, the global random module by default
+        :type rng: random.Random
         :return: bool
         :rtype: True or False
         """
         if self.fitness <= herb_fitness:
             return False
         elif (self.fitness > herb_fitness) and ((self.fitness - herb_fitness) < self.DeltaPhiMax):
-            if ((self.fitness - herb_fitness) / self.DeltaPhiMax) > random.random():
+            if ((self.fitness - herb_fitness) / self.DeltaPhiMax) > rng.random():
                 return True
             else:
                 return False
         else:
             return True
 
-    def carn_birth(self, num_carn):
+    def carn_birth(self, num_carn, rng=random):
         """
         A function for the Carnivore giving birth.
 
         :param num_carn: The number of varnivores in a cell/tile
+        :param rng: the random number generator, the global random module by default
+        :type rng: random.Random
         :return: Carnivore or None
         """
-        self.prob = 0 if self.weight < self.zeta * (self.w_birth + self.sigma_birth) \
-            else min(1, self.gamma * self.fitness * (num_carn - 1))
-        r = random.random()
-        if r < self.prob:
-            new_weight = random.gauss(self.w_birth, self.sigma_birth)
+        if rng.random() < self.birth_probability(num_carn):
+            new_weight = rng.gauss(self.w_birth, self.sigma_birth)
             if new_weight > 0:
                 self.weight -= self.xi * new_weight
                 self.fitness_update = True
                 return Carnivore(new_weight, 0)
 
-    def death(self):
+    def death(self, rng=random):
         """
         A function that calculates whether a Carnivore dies or not.
 
+        :param rng: the random number generator, the global random module by default
+        :type rng: random.Random
         :returns: self.dead
         :rtype: True or False
        """
-        if self.weight <= 0 or random.random() < self.omega * (1 - self.fitness):
+        if self.weight <= 0 or rng.random() < self.omega * (1 - self.fitness):
             self.dead = True
-            self.remove_animals()
         return self.dead
+
+
+for species in (Herbivore, Carnivore):
+    species.build_age_table()
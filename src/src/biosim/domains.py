@@ -0,0 +1,489 @@
+"""
+Spatial domain decomposition of the island for BioSim.
+
+The map is split into rectangular blocks, and every block is simulated by an island of its
+own in a separate worker process. The island of a block has a halo, a ring of one tile
+around the block with copies of the neighbouring tiles, so the animals on the edge of the
+block can migrate out of it. Animals that migrate into the halo are sent to the block that
+owns the tile, so only the animals that cross the edges of the blocks are exchanged.
+
+Every tile draws from its own random number generator, derived from the seed and the
+position of the tile on the whole island, and the migrants are handed over in the order of
+the tiles they come from. The results are therefore the same as for one
+:class:`biosim.island.Island` with tile streams, whatever the number of blocks.
+"""
+
+import biosim.landscape as ls
+from biosim.island import Island, Tile, read_geography, get_parameters, set_parameters
+from biosim.streams import substream, get_states, set_states
+from bisect import bisect_right
+from multiprocessing import Pipe, Process
+import numpy as np
+
+
+def split(length, parts):
+    """
+    A function that splits a number of rows or columns into parts of nearly equal size.
+
+    :param length: the number of rows or columns
+    :type length: int
+    :param parts: the number of parts
+    :type parts: int
+    :return: the first row or column of every part, and length at the end
+    :rtype: list of int
+    """
+    return [length * part // parts for part in range(parts + 1)]
+
+
+class BlockIsland(Island):
+    """
+    Represents one block of a larger island, with a halo of one tile around it.
+    """
+    def __init__(self, rows, first_row, first_col, width, seed):
+        """
+        :param rows: the rows of the block with the halo, water outside the island
+        :type rows: list of str
+        :param first_row: the row of the island where the block starts, from 0
+        :type first_row: int
+        :param first_col: the column of the island where the block starts, from 0
+        :type first_col: int
+        :param width: the number of columns of the island
+        :type width: int
+        :param seed: the seed of the simulation
+        :type seed: int
+        """
+        super().__init__(rows)
+        self.index = {}
+        self.halo = set()
+        for num, row in enumerate(self.map):
+            for num2, loc in enumerate(row):
+                self.index[loc] = (first_row + num - 1) * width + first_col + num2 - 1
+                if num in (0, len(self.map) - 1) or num2 in (0, len(row) - 1):
+                    self.halo.add(loc)
+                else:
+                    loc.rng = substream(seed, self.index[loc])
+        self.owned = [loc for loc in self.tiles if loc not in self.halo]
+        self.by_index = {self.index[loc]: loc for loc in self.owned}
+        self.arrivals = []
+
+    def first_half(self):
+        """
+        A function that runs the year of the block up to the hand-over of the migrants. The
+        migrants to tiles of the block are kept until the migrants from the other blocks
+        have arrived.
+
+        :return: the migrants to other blocks, as (new tile, old tile, species, animal)
+        :rtype: list of tuples
+        """
+        self.feeding()
+        self.procreation()
+        emigrants = []
+        self.arrivals = []
+        for loc, (herb_moves, carn_moves) in zip(self.occupied_tiles(),
+                                                 self.map_tiles(Tile.choose_migrants)):
+            for species, moves in (('Herbivore', herb_moves), ('Carnivore', carn_moves)):
+                for new_loc, ani in moves:
+                    move = (self.index[new_loc], self.index[loc], species, ani)
+                    if new_loc in self.halo:
+                        emigrants.append(move)
+                    else:
+                        self.arrivals.append(move)
+        return emigrants
+
+    def second_half(self, immigrants):
+        """
+        A function that hands over the migrants in the order of the tiles they come from, as
+        on the whole island, and runs the rest of the year of the block.
+
+        :param immigrants: the migrants from other blocks, as (new tile, old tile, species,
+                           animal)
+        :type immigrants: list of tuples
+        :return: the summary of the animals of the block at the end of the year, see
+                 Island.summary
+        :rtype: dict
+        """
+        pending = set()
+        for new_index, _, species, ani in sorted(self.arrivals + immigrants,
+                                                 key=lambda move: move[1]):
+            loc = self.by_index[new_index]
+            if species == 'Herbivore':
+                loc.migrants_herbs(ani)
+            else:
+                loc.migrants_carns(ani)
+            pending.add(loc)
+        self.arrivals = []
+        for loc in pending:
+            loc.integrate()
+        self.update_occupied(pending)
+        self.end_of_year()
+        self.death()
+        return self.year_summary
+
+    def owned_density(self):
+        """
+        A function that counts the animals of each species on every tile of the block,
+        without the halo.
+
+        :return: e.g {'Herbivore': [[0, 3, ..], ..], 'Carnivore': [..]}
+        :rtype: dict of nested lists
+        """
+        return {species: [row[1:-1] for row in density[1:-1]]
+                for species, density in self.density().items()}
+
+    def get_state(self):
+        """
+        A function that collects the animals of the block, see Island.get_state, with the
+        tiles numbered as on the whole island.
+
+        :return: the tile index, age, weight, fitness and stale flag of the fitness of every
+                 animal, per species
+        :rtype: dict of numpy arrays
+        """
+        state = super().get_state()
+        numbers = np.array([self.index[loc] for loc in self.tiles])
+        for species in ('Herbivore', 'Carnivore'):
+            state[f'{species}_tile'] = numbers[state[f'{species}_tile']]
+        return state
+
+    def set_state(self, state):
+        """
+        A function that replaces the animals of the block, see Island.set_state, with the
+        tiles numbered as on the whole island.
+
+        :param state: the animals of the block
+        :type state: dict of numpy arrays
+        """
+        state = dict(state)
+        for species in ('Herbivore', 'Carnivore'):
+            state[f'{species}_tile'] = np.array(
+                [self.number[self.by_index[index]] for index in state[f'{species}_tile']],
+                dtype=int)
+        super().set_state(state)
+
+    def get_tile_states(self):
+        """
+        A function that collects the states of the generators of the tiles of the block.
+
+        :return: the states, see biosim.streams.get_states, and the number of every tile on
+                 the whole island as 'tile'
+        :rtype: dict of numpy arrays
+        """
+        states = get_states([loc.rng for loc in self.owned])
+        states['tile'] = np.array([self.index[loc] for loc in self.owned])
+        return states
+
+    def set_tile_states(self, states):
+        """
+        A function that sets the states of the generators of the tiles of the block.
+
+        :param states: the states from get_tile_states
+        :type states: dict of numpy arrays
+        """
+        set_states([self.by_index[index].rng for index in states['tile']],
+                   {key: value for key, value in states.items() if key != 'tile'})
+
+
+def run_block(connection, rows, first_row, first_col, width, seed, parameters):
+    """
+    A function that runs in a worker process and simulates one block. It calls the methods
+    of the island of the block that the main process asks for, until it is asked to stop.
+    The parameters of the main process are set before every call, so the animals of the
+    block are always made and simulated with the current parameters.
+
+    :param connection: the connection to the main process
+    :type connection: multiprocessing.connection.Connection
+    :param parameters: the parameters of the animals and landscapes when the block is made
+    :type parameters: dict
+
+    The other parameters are the parameters of BlockIsland.
+    """
+    set_parameters(parameters)
+    block = BlockIsland(rows, first_row, first_col, width, seed)
+    while True:
+        command, arguments, parameters = connection.recv()
+        if command == 'stop':
+            break
+        try:
+            set_parameters(parameters)
+            result = getattr(block, command)(*arguments)
+        except Exception as error:
+            result = error
+        connection.send(result)
+    connection.close()
+
+
+class DomainIsland:
+    """
+    Represents the Island for the simulation, split into rectangular blocks that are
+    simulated in separate worker processes. It can be used in the same way as
+    :class:`biosim.island.Island` to run and inspect the simulation, and must be closed
+    to stop the workers.
+    """
+    landscapes = (ls.Water, ls.Lowland, ls.Highland, ls.Desert)
+
+    def __init__(self, geogr, seed, blocks=(2, 2)):
+        """
+        :param geogr: a multi-line string of landscape-codes
+        :type geogr: str
+        :param seed: the seed of the simulation
+        :type seed: int
+        :param blocks: the number of blocks of rows and of columns
+        :type blocks: tuple e.g (2, 2)
+        :raises ValueError: If the map is invalid, or has fewer rows or columns than blocks
+        """
+        self.rows = read_geography(geogr)
+        self.shape = (len(self.rows), len(self.rows[0]))
+        if not (1 <= blocks[0] <= self.shape[0] and 1 <= blocks[1] <= self.shape[1]):
+            raise ValueError('Invalid number of blocks')
+        self.traversable = {landscape.type: landscape.traversable
+                            for landscape in self.landscapes}
+        self.row_starts = split(self.shape[0], blocks[0])
+        self.col_starts = split(self.shape[1], blocks[1])
+        self.blocks = []
+        self.connections = []
+        self.workers = []
+        for first_row, stop_row in zip(self.row_starts[:-1], self.row_starts[1:]):
+            for first_col, stop_col in zip(self.col_starts[:-1], self.col_starts[1:]):
+                rows = []
+                for num in range(first_row - 1, stop_row + 1):
+                    if 0 <= num < self.shape[0]:
+                        rows.append(('W' + self.rows[num] + 'W')[first_col:stop_col + 2])
+                    else:
+                        rows.append('W' * (stop_col - first_col + 2))
+                connection, worker_connection = Pipe()
+                worker = Process(target=run_block,
+                                 args=(worker_connection, rows, first_row, first_col,
+                                       self.shape[1], seed, get_parameters()),
+                                 daemon=True)
+                worker.start()
+                self.blocks.append((first_row, stop_row, first_col, stop_col))
+                self.connections.append(connection)
+                self.workers.append(worker)
+        self.counts = {'Herbivore': 0, 'Carnivore': 0}
+        # The summary of the animals at the end of the last year, from the blocks
+        self.year_summary = None
+
+    def owner(self, index):
+        """
+        A function that finds the block that a tile belongs to.
+
+        :param index: the number of the tile on the island, row by row from 0
+        :type index: int
+        :return: the number of the block
+        :rtype: int
+        """
+        row, col = divmod(index, self.shape[1])
+        return (bisect_right(self.row_starts, row) - 1) * (len(self.col_starts) - 1) + \
+            bisect_right(self.col_starts, col) - 1
+
+    def call(self, command, arguments=None):
+        """
+        A function that calls a method of the island of every block, with the current
+        parameters, and waits for the results of all blocks.
+
+        :param command: the name of the method
+        :type command: str
+        :param arguments: the arguments for every block, none if not given
+        :type arguments: list of tuples
+        :return: the result of every block
+        :rtype: list
+        """
+        if arguments is None:
+            arguments = [()] * len(self.connections)
+        parameters = get_parameters()
+        for connection, argument in zip(self.connections, arguments):
+            connection.send((command, argument, parameters))
+        results = [connection.recv() for connection in self.connections]
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return results
+
+    def close(self):
+        """
+        A function that stops the worker processes.
+        """
+        for connection, worker in zip(self.connections, self.workers):
+            if worker.is_alive():
+                connection.send(('stop', (), None))
+                worker.join()
+            connection.close()
+        self.workers = []
+        self.connections = []
+
+    def add_animals(self, population):
+        """
+        A function that adds animals to the island
+
+        :param population: the animals that are being added to the island
+        :type population: list of dicts
+        :raises ValueError: If a location is inhabitable, before any animals are added
+
+        .. note::
+            The list follows the same format as :meth:`biosim.island.Island.add_animals`
+        """
+        parts = [[] for _ in self.blocks]
+        for animal_type in population:
+            row, col = animal_type['loc'][0] - 1, animal_type['loc'][1] - 1
+            if not self.traversable[self.rows[row][col]]:
+                raise ValueError('Inhabitable landscape')
+            block = self.owner(row * self.shape[1] + col)
+            first_row, _, first_col, _ = self.blocks[block]
+            parts[block].append({'loc': (row - first_row + 2, col - first_col + 2),
+                                 'pop': animal_type['pop']})
+        self.call('add_animals', [(part,) for part in parts])
+        for animal_type in population:
+            for animal in animal_type['pop']:
+                if animal['species'] in self.counts:
+                    self.counts[animal['species']] += 1
+
+    def num_animals_per_species(self):
+        """
+        A function that returns the number of animals of each species on the island.
+
+        :return: e.g {'Herbivore': 20, 'Carnivore': 5}
+        :rtype: dict
+        """
+        return dict(self.counts)
+
+    def animal_properties(self):
+        """
+        A function that collects the age, weight and fitness of every animal on the island.
+
+        :return: e.g {'Herbivore': {'age': [..], 'weight': [..], 'fitness': [..]}, ..}
+        :rtype: dict
+        """
+        properties = {'Herbivore': {'age': [], 'weight': [], 'fitness': []},
+                      'Carnivore': {'age': [], 'weight': [], 'fitness': []}}
+        for block in self.call('animal_properties'):
+            for species, values in block.items():
+                for key in values:
+                    properties[species][key] += values[key]
+        return properties
+
+    def density(self):
+        """
+        A function that counts the animals of each species on every tile of the island.
+
+        :return: e.g {'Herbivore': [[0, 0, 0], [0, 3, 0], ..], 'Carnivore': [..]}
+        :rtype: dict of nested lists
+        """
+        density = {'Herbivore': np.zeros(self.shape, dtype=int),
+                   'Carnivore': np.zeros(self.shape, dtype=int)}
+        for (first_row, stop_row, first_col, stop_col), block in zip(
+                self.blocks, self.call('owned_density')):
+            for species in density:
+                density[species][first_row:stop_row, first_col:stop_col] = block[species]
+        return {species: counts.tolist() for species, counts in density.items()}
+
+    def summary(self):
+        """
+        A function that counts the animals of each species per landscape, and finds the mean
+        fitness of each species.
+
+        :return: e.g {'Herbivore': {'L': 15, 'H': 5, 'D': 0, 'fitness': 0.6}, ..}
+        :rtype: dict
+        """
+        return self.combine(self.call('summary'))
+
+    @staticmethod
+    def combine(summaries):
+        """
+        A static method that adds up the summaries of the blocks.
+
+        :param summaries: the summary of every block, see Island.summary
+        :type summaries: list of dicts
+        :return: e.g {'Herbivore': {'L': 15, 'H': 5, 'D': 0, 'fitness': 0.6}, ..}
+        :rtype: dict
+        """
+        summary = {'Herbivore': {'L': 0, 'H': 0, 'D': 0, 'fitness': 0},
+                   'Carnivore': {'L': 0, 'H': 0, 'D': 0, 'fitness': 0}}
+        for block in summaries:
+            for species, counts in block.items():
+                num = counts['L'] + counts['H'] + counts['D']
+                for key in ('L', 'H', 'D'):
+                    summary[species][key] += counts[key]
+                summary[species]['fitness'] += counts['fitness'] * num
+        for counts in summary.values():
+            num = counts['L'] + counts['H'] + counts['D']
+            counts['fitness'] = counts['fitness'] / num if num else 0
+        return summary
+
+    def get_state(self):
+        """
+        A function that collects the animals of all blocks in the same order as
+        :meth:`biosim.island.Island.get_state`.
+
+        :return: the tile index, age, weight, fitness and stale flag of the fitness of every
+                 animal, per species
+        :rtype: dict of numpy arrays
+        """
+        blocks = self.call('get_state')
+        state = {key: np.concatenate([block[key] for block in blocks]) for key in blocks[0]}
+        for species in ('Herbivore', 'Carnivore'):
+            order = np.argsort(state[f'{species}_tile'], kind='stable')
+            for field in ('tile', 'age', 'weight', 'fitness', 'stale'):
+                state[f'{species}_{field}'] = state[f'{species}_{field}'][order]
+        return state
+
+    def set_state(self, state):
+        """
+        A function that replaces the animals on the island with the animals collected by
+        get_state, and sends every block its own animals.
+
+        :param state: the animals from get_state
+        :type state: dict of numpy arrays
+        """
+        owners = {species: np.array([self.owner(index) for index in state[f'{species}_tile']],
+                                    dtype=int)
+                  for species in ('Herbivore', 'Carnivore')}
+        self.call('set_state', [({f'{species}_{field}': state[f'{species}_{field}'][
+            owners[species] == block]
+            for species in ('Herbivore', 'Carnivore')
+            for field in ('tile', 'age', 'weight', 'fitness', 'stale')},)
+            for block in range(len(self.blocks))])
+        self.counts = {species: len(state[f'{species}_tile']) for species in self.counts}
+
+    def get_tile_states(self):
+        """
+        A function that collects the states of the generators of all tiles, in the order of
+        the tiles on the island.
+
+        :return: the states, see biosim.streams.get_states
+        :rtype: dict of numpy arrays
+        """
+        blocks = self.call('get_tile_states')
+        order = np.argsort(np.concatenate([block['tile'] for block in blocks]))
+        return {key: np.concatenate([block[key] for block in blocks])[order]
+                for key in blocks[0] if key != 'tile'}
+
+    def set_tile_states(self, states):
+        """
+        A function that sets the states of the generators of all tiles.
+
+        :param states: the states from get_tile_states
+        :type states: dict of numpy arrays
+        """
+        tiles = np.arange(self.shape[0] * self.shape[1])
+        owners = np.array([self.owner(index) for index in tiles])
+        self.call('set_tile_states', [(dict({key: value[owners == block]
+                                             for key, value in states.items()},
+                                            tile=tiles[owners == block]),)
+                                      for block in range(len(self.blocks))])
+
+    def yearly_cycle(self):
+        """
+        A function that runs the annual cycle of the island. The blocks run the year up to
+        migration, the migrants that leave their block are sent to the block of their new
+        tile, and the blocks run the rest of the year.
+        """
+        emigrants = self.call('first_half')
+        immigrants = [[] for _ in self.blocks]
+        for moves in emigrants:
+            for move in moves:
+                immigrants[self.owner(move[0])].append(move)
+        self.year_summary = self.combine(self.call('second_half',
+                                                   [(moves,) for moves in immigrants]))
+        self.counts = {species: sum(self.year_summary[species][landscape]
+                                    for landscape in ('L', 'H', 'D'))
+                       for species in self.counts}
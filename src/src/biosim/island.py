@@ -1,13 +1,75 @@
 import biosim.landscape as ls
 from biosim.animals import Herbivore, Carnivore
+from biosim.streams import substreams, get_states, set_states
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
 import random
+import numpy as np
+
+# A migrating animal moves down, up, right or left when a random number is at most the
+# first, second or third limit, or above all of them
+DIRECTION_LIMITS = (0.25, 0.50, 0.75)
+# The change in (row, column) for moving down, up, right and left
+DIRECTION_STEPS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+
+def read_geography(geogr):
+    """
+    A function that checks an island-map and splits it into rows of landscape-codes.
+
+    :param geogr: a multi-line string of landscape-codes
+    :type geogr: str
+    :return: the rows of the map
+    :rtype: list of str
+    :raises ValueError: If the map is invalid
+    """
+    geogr = geogr.splitlines()
+    map_len = len(geogr[0])
+    if 'W' in (set(geogr[0]) and set(geogr[len(geogr)-1])) and (len(set(geogr[0])) and
+                                                                len(set(geogr[len(geogr)-1]))) == 1:
+        for row in geogr:
+            if len(row) == map_len:
+                if 'W' in row[0] and row[len(row)-1]:
+                    for col in row:
+                        if col not in ('W', 'L', 'D', 'H'):
+                            raise ValueError('Invalid landscape')
+                else:
+                    raise ValueError('Invalid island-map')
+            else:
+                raise ValueError('Inconsistent line length')
+    else:
+        raise ValueError('Invalid island-map')
+    return geogr
+
+
+def get_parameters():
+    """
+    A function that collects the current parameters of every animal and landscape class,
+    e.g. to hand them to another process.
+
+    :return: e.g {'Herbivore': {'beta': 0.9, ..}, 'Lowland': {'f_max': 700, ..}, ..}
+    :rtype: dict
+    """
+    return {cls.__name__: {key: getattr(cls, key) for key in cls.default_params}
+            for cls in (Herbivore, Carnivore, ls.Lowland, ls.Highland, ls.Water, ls.Desert)}
+
+
+def set_parameters(parameters):
+    """
+    A function that sets the parameters of every animal and landscape class.
+
+    :param parameters: the parameters from get_parameters
+    :type parameters: dict
+    """
+    for cls in (Herbivore, Carnivore, ls.Lowland, ls.Highland, ls.Water, ls.Desert):
+        cls.set_params(parameters[cls.__name__])
 
 
 class Tile:
     """
     A class for each tile/cell on the island
     """
-    def __init__(self, landscape, loc, herbs=None, carns=None):
+    def __init__(self, landscape, loc, herbs=None, carns=None, rng=random):
         """
         :param landscape: the landscape of the tile
         :type landscape: class
@@ -17,8 +79,14 @@ class Tile:
         :type herbs: list
         :param carns: the current carnivores on the tile
         :type carns: list
+        :param rng: the random number generator of the tile, the global random module by default
+        :type rng: random.Random
+
+        The neighbours below, above, right and left of the tile are set by the island, as None
+        if they are outside the map or not traversable.
         """
         self.__loc__ = loc
+        self.rng = rng
         if herbs is None:
             self.herbs = []
         else:
@@ -44,6 +112,7 @@ class Tile:
         self.mig_h = []
         self.mig_c = []
         self.traversable = landscape.traversable
+        self.neighbours = (None, None, None, None)
 
     def location(self):
         """
@@ -72,27 +141,6 @@ class Tile:
         """
         return self.__loc__[0]
 
-    @staticmethod
-    def new_location(tile):
-        """
-        A static method for finding a new tile for migration.
-
-        :param tile: the tile that animals migrate from
-        :type tile: Tile class
-        :return: new_loc
-        :rtype: tuple e.g (2,3)
-        """
-        r = random.random()
-        if r <= 0.25:
-            new_loc = (tile.x_coordinates() + 1, tile.y_coordinates())
-        elif r <= 0.50:
-            new_loc = (tile.x_coordinates() - 1, tile.y_coordinates())
-        elif r <= 0.75:
-            new_loc = (tile.x_coordinates(), tile.y_coordinates() + 1)
-        else:
-            new_loc = (tile.x_coordinates(), tile.y_coordinates() - 1)
-        return new_loc
-
     def add_herb_to_tile(self, herbivore):
         """
         A function that adds a herbivore to the current tile.
@@ -142,6 +190,18 @@ class Tile:
             self.carns += self.new_c
             self.new_c = []
 
+    def animals_eat(self):
+        """
+        A function for feeding all animals on the current tile. The herbivores eat the fodder
+        of the landscape first, then the carnivores hunt.
+
+        :return: the number of killed herbivores
+        :rtype: int
+        """
+        if self.landscape.food:
+            self.feed_herbs(self.landscape.f_max)
+        return self.feed_carns()
+
     def feed_herbs(self, fodder):
         """
         A function for "feeding" herbivores in the current tile. The herbivores eat in
@@ -151,96 +211,147 @@ class Tile:
         :type fodder: int
         """
         if self.herbs:
+            Herbivore.update_fitness_batch(self.herbs)
             self.herbs.sort(key=lambda animal: animal.fitness, reverse=True)
             for herb in self.herbs:
                 if fodder > herb.F:
                     herb.eat(herb.F)
-                    herb.update_fitness()
                     fodder -= herb.F
                 else:
                     herb.eat(fodder)
-                    herb.update_fitness()
                     fodder -= fodder
+            Herbivore.update_fitness_batch(self.herbs)
 
     def feed_carns(self):
         """
         A function for "hunting". The carnivores hunt in a random order, and each carnivore
         hunt until it is full, or has tried to kill every herbivore on the current tile.
         The herbivores are hunted in increasing order of fitness.
+
+        Killed herbivores are only marked as dead while the carnivores hunt, and skipped by
+        the next carnivores. The list of herbivores is compacted once, after the hunt.
+
+        :return: the number of killed herbivores
+        :rtype: int
         """
+        killed = 0
         if self.herbs:
             if self.carns:
-                random.shuffle(self.carns)
+                self.rng.shuffle(self.carns)
+                Carnivore.update_fitness_batch(self.carns)
                 self.herbs.sort(key=lambda animal: animal.fitness)
+                herbs = self.herbs
+                first = 0
                 for carn in self.carns:
                     herb_eaten = 0
-                    for herb in self.herbs:
-                        carn.update_fitness()
+                    for num in range(first, len(herbs)):
+                        herb = herbs[num]
+                        if herb.dead:
+                            continue
                         if carn.fitness < herb.fitness:
                             break
-                        if carn.herb_killed(herb.fitness):
+                        if carn.herb_killed(herb.fitness, self.rng):
+                            herb.dead = True
+                            killed += 1
                             if herb_eaten < carn.F:
                                 herb_eaten += herb.weight
                                 carn.eat(herb.weight)
                                 carn.update_fitness()
-                                herb.dead = True
-                                Herbivore.remove_animals()
                             else:
                                 carn.eat(carn.F - herb_eaten)
                                 carn.update_fitness()
-                                herb.dead = True
-                                Herbivore.remove_animals()
                                 break
-                    self.herbs = [herb_survived for herb_survived in self.herbs
+                    while first < len(herbs) and herbs[first].dead:
+                        first += 1
+                if killed:
+                    self.herbs = [herb_survived for herb_survived in herbs
                                   if not herb_survived.dead]
+        return killed
 
     def birth_animal(self):
         """
         A function for calculating the births of the animals on the current tile,
         and adds them to their respective lists.
+
+        :return: the number of newborn herbivores and carnivores
+        :rtype: tuple of int
         """
+        breed_herb = len(self.herbs)
         if self.herbs:
-            breed_herb = len(self.herbs)
+            Herbivore.update_fitness_batch(self.herbs)
             for herb in self.herbs:
-                herb.update_fitness()
-                j = herb.herb_birth(breed_herb)
+                j = herb.herb_birth(breed_herb, self.rng)
                 if j is not None:
                     self.herbs.append(j)
+        breed_carn = len(self.carns)
         if self.carns:
-            breed_carn = len(self.carns)
+            Carnivore.update_fitness_batch(self.carns)
             for carn in self.carns:
-                carn.update_fitness()
-                j = carn.carn_birth(breed_carn)
+                j = carn.carn_birth(breed_carn, self.rng)
                 if j is not None:
                     self.carns.append(j)
+        return len(self.herbs) - breed_herb, len(self.carns) - breed_carn
 
-    def animals_migrate(self, loc, get_map):
+    def choose_migrants(self):
         """
-        A function for calculating migration for all animals on the tile. They are added to a
-        temporary list in the new tile, and removed from the current tile.
+        A function that decides which animals on the tile migrate, and where to. Every migrant
+        picks one of the four neighbours in self.neighbours, and stays if it is not
+        traversable. The migrants are removed from the current tile in one pass after every
+        animal has been considered.
 
-        :param loc: the coordinates of the current tile
-        :type loc: tuple e.g (3,3)
-        :param get_map: the island map
-        :type get_map: a nested list
+        :return: the migrating herbivores and carnivores with their new tiles,
+                 e.g ([(tile, herb), ..], [(tile, carn), ..])
+        :rtype: tuple of lists
         """
+        neighbours = self.neighbours
+        herb_moves = []
+        Herbivore.update_fitness_batch(self.herbs)
         for herb in self.herbs:
-            herb.update_fitness()
-            if herb.migrate():
-                new_loc = self.new_location(loc)
-                if get_map[new_loc[0] - 1][new_loc[1] - 1].traversable:
+            if herb.migrate(self.rng):
+                new_loc = neighbours[bisect_left(DIRECTION_LIMITS, self.rng.random())]
+                if new_loc is not None:
                     self.mig_h.append(herb)
-                    get_map[new_loc[0] - 1][new_loc[1] - 1].migrants_herbs(herb)
-            self.remove_herb()
+                    herb_moves.append((new_loc, herb))
+        self.remove_herb()
 
+        carn_moves = []
+        Carnivore.update_fitness_batch(self.carns)
         for carn in self.carns:
-            carn.update_fitness()
-            if carn.migrate():
-                new_loc = self.new_location(loc)
-                if get_map[new_loc[0] - 1][new_loc[1] - 1].traversable:
+            if carn.migrate(self.rng):
+                new_loc = neighbours[bisect_left(DIRECTION_LIMITS, self.rng.random())]
+                if new_loc is not None:
                     self.mig_c.append(carn)
-                    get_map[new_loc[0] - 1][new_loc[1] - 1].migrants_carns(carn)
-            self.remove_carn()
+                    carn_moves.append((new_loc, carn))
+        self.remove_carn()
+        return herb_moves, carn_moves
+
+    @staticmethod
+    def send_migrants(herb_moves, carn_moves):
+        """
+        A static method that adds migrants to the temporary lists of their new tiles.
+
+        :param herb_moves: the migrating herbivores with their new tiles
+        :type herb_moves: list of tuples
+        :param carn_moves: the migrating carnivores with their new tiles
+        :type carn_moves: list of tuples
+        :return: the tiles that were given migrants
+        :rtype: set
+        """
+        for new_loc, herb in herb_moves:
+            new_loc.migrants_herbs(herb)
+        for new_loc, carn in carn_moves:
+            new_loc.migrants_carns(carn)
+        return {new_loc for new_loc, _ in herb_moves} | {new_loc for new_loc, _ in carn_moves}
+
+    def animals_migrate(self):
+        """
+        A function for calculating migration for all animals on the tile. They are added to a
+        temporary list in the new tile, see choose_migrants and send_migrants.
+
+        :return: the tiles that were given migrants
+        :rtype: set
+        """
+        return self.send_migrants(*self.choose_migrants())
 
     def animals_age(self):
         """
@@ -266,82 +377,222 @@ class Tile:
             for carn in self.carns:
                 carn.losing_weight()
 
+    def animals_age_and_weight_loss(self):
+        """
+        A function for aging all animals in the current tile and their weightloss, in one pass
+        """
+        for herb in self.herbs:
+            herb.update_age_and_weight()
+        for carn in self.carns:
+            carn.update_age_and_weight()
+
     def animals_dead(self):
         """
         A function that calculates the death of animals on the tile, and removes them from
-        their respective lists
+        their respective lists. The survivors are kept in the same pass, and the sum of their
+        fitness is found for the summary of the island.
+
+        :return: the sum of the fitness of the surviving herbivores and carnivores
+        :rtype: tuple of float
         """
         if self.herbs:
-            for herb in self.herbs:
-                herb.update_fitness()
-                herb.death()
-            self.herbs = [herb for herb in self.herbs if not herb.dead]
+            Herbivore.update_fitness_batch(self.herbs)
+            self.herbs = [herb for herb in self.herbs if not herb.death(self.rng)]
         if self.carns:
-            for carn in self.carns:
-                carn.update_fitness()
-                carn.death()
-            self.carns = [carn for carn in self.carns if not carn.dead]
+            Carnivore.update_fitness_batch(self.carns)
+            self.carns = [carn for carn in self.carns if not carn.death(self.rng)]
+        return sum(herb.fitness for herb in self.herbs), sum(carn.fitness for carn in self.carns)
 
     def remove_herb(self):
         """
-        Removes the herbivores that moves to another tile
+        Removes the herbivores that moves to another tile. The migrants are looked up by id,
+        so the herbivores are removed in linear time.
         """
         if self.mig_h:
-            self.herbs = [herb_stay for herb_stay in self.herbs if herb_stay not in self.mig_h]
+            leaving = {id(herb) for herb in self.mig_h}
+            self.herbs = [herb_stay for herb_stay in self.herbs if id(herb_stay) not in leaving]
             self.mig_h = []
 
     def remove_carn(self):
         """
-        Removes the herbivores that moves to another tile
+        Removes the carnivores that moves to another tile. The migrants are looked up by id,
+        so the carnivores are removed in linear time.
         """
         if self.mig_c:
-            self.carns = [carn_stay for carn_stay in self.carns if carn_stay not in self.mig_c]
+            leaving = {id(carn) for carn in self.mig_c}
+            self.carns = [carn_stay for carn_stay in self.carns if id(carn_stay) not in leaving]
             self.mig_c = []
 
 
 class Island:
     """
     Represents the Island for the simulation.
+
+    The island keeps an index of the tiles with animals on them, in the order of self.tiles,
+    and the yearly cycle only visits those tiles. The index is updated by add_animals and by
+    the phases of the year. Animals placed directly on a tile are only found after the tile
+    is given to mark_occupied.
+
+    The tiles can be handled by a pool of worker threads, see use_workers. The migrants are
+    always handed over to their new tiles by the island, in the order of the tiles they
+    come from, so the results do not depend on the number of workers.
     """
-    def __init__(self, geogr):
-        """
-        :param geogr: a nested lists of landscape-codes
-        :type nested lists:
+    def __init__(self, geogr, rng=random):
+        """
+        :param geogr: a multi-line string of landscape-codes, or its rows if they are
+                      already checked, e.g. for a part of a larger map
+        :type geogr: str or list of str
+        :param rng: the random number generator shared by all tiles, the global random
+                    module by default
+        :type rng: random.Random
         :raises ValueError: If the map is invalid
         """
+        self.rng = rng
         self.map = []
         self.tiles = []
-        geogr = geogr.splitlines()
-        map_len = len(geogr[0])
-        if 'W' in (set(geogr[0]) and set(geogr[len(geogr)-1])) and (len(set(geogr[0])) and
-                                                                    len(set(geogr[len(geogr)-1]))) == 1:
-            for num, row in enumerate(geogr):
-                if len(row) == map_len:
-                    section = []
-                    if 'W' in row[0] and row[len(row)-1]:
-                        for num2, col in enumerate(row):
-                            if col == 'W':
-                                col = Tile(ls.Water, (num2+1, num+1))
-                            elif col == 'L':
-                                col = Tile(ls.Lowland, (num2+1, num+1))
-                            elif col == 'D':
-                                col = Tile(ls.Desert, (num2+1, num+1))
-                            elif col == 'H':
-                                col = Tile(ls.Highland, (num2+1, num+1))
-                            else:
-                                raise ValueError('Invalid landscape')
-                            section.append(col)
-                            self.tiles.append(col)
-                        self.map.append(section)
-                    else:
-                        raise ValueError('Invalid island-map')
+        rows = geogr if isinstance(geogr, list) else read_geography(geogr)
+        for num, row in enumerate(rows):
+            section = []
+            for num2, col in enumerate(row):
+                if col == 'W':
+                    col = Tile(ls.Water, (num2+1, num+1), rng=rng)
+                elif col == 'L':
+                    col = Tile(ls.Lowland, (num2+1, num+1), rng=rng)
+                elif col == 'D':
+                    col = Tile(ls.Desert, (num2+1, num+1), rng=rng)
                 else:
-                    raise ValueError('Inconsistent line length')
-        else:
-            raise ValueError('Invalid island-map')
+                    col = Tile(ls.Highland, (num2+1, num+1), rng=rng)
+                section.append(col)
+                self.tiles.append(col)
+            self.map.append(section)
+
+        for num, row in enumerate(self.map):
+            for num2, loc in enumerate(row):
+                neighbours = []
+                for row_step, col_step in DIRECTION_STEPS:
+                    new_row, new_col = num + row_step, num2 + col_step
+                    if 0 <= new_row < len(self.map) and 0 <= new_col < len(row) and \
+                            self.map[new_row][new_col].traversable:
+                        neighbours.append(self.map[new_row][new_col])
+                    else:
+                        neighbours.append(None)
+                loc.neighbours = tuple(neighbours)
 
         self.animals = {'Carnivore': Carnivore,
                         'Herbivore': Herbivore}
+        self.number = {loc: num for num, loc in enumerate(self.tiles)}
+        self.occupied = []
+        # The summary of the animals at the end of the last year, found by death
+        self.year_summary = None
+        self.workers = 1
+        self.executor = None
+        # If False, the yearly cycle ages the animals and takes off their weight in two passes
+        self.fused_aging = True
+
+    def use_tile_streams(self, seed):
+        """
+        A function that gives every tile its own random number generator, derived from the
+        seed and the position of the tile. The results of a tile then do not depend on the
+        order in which the tiles are handled.
+
+        :param seed: the seed of the simulation
+        :type seed: int
+        """
+        for loc, rng in zip(self.tiles, substreams(seed, len(self.tiles))):
+            loc.rng = rng
+
+    def get_tile_states(self):
+        """
+        A function that collects the states of the random number generators of the tiles, if
+        they have their own generators, see use_tile_streams.
+
+        :return: the states, see biosim.streams.get_states, empty if the tiles use the
+                 generator of the island
+        :rtype: dict of numpy arrays
+        """
+        if all(loc.rng is self.rng for loc in self.tiles):
+            return {}
+        return get_states([loc.rng for loc in self.tiles])
+
+    def set_tile_states(self, states):
+        """
+        A function that gives every tile its own random number generator, with the states
+        collected by get_tile_states.
+
+        :param states: the states from get_tile_states
+        :type states: dict of numpy arrays
+        """
+        for loc in self.tiles:
+            loc.rng = random.Random()
+        set_states([loc.rng for loc in self.tiles], states)
+
+    def use_workers(self, workers):
+        """
+        A function that splits the occupied tiles into one block per worker, and lets a pool
+        of threads handle the blocks in every phase of the year. The tiles must have their own
+        random number generators, see use_tile_streams. The pool is shut down with 1 worker.
+
+        :param workers: the number of worker threads
+        :type workers: int
+        :raises ValueError: If the tiles share a random number generator
+        """
+        if workers > 1 and len({id(loc.rng) for loc in self.tiles}) < len(self.tiles):
+            raise ValueError('Every tile needs its own random number generator')
+        if self.executor is not None:
+            self.executor.shutdown()
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    def map_tiles(self, method):
+        """
+        A function that calls a method of every occupied tile, in blocks of tiles handled by
+        the workers, and returns the results in the order of the tiles.
+
+        :param method: a method of Tile, e.g Tile.animals_dead
+        :type method: function
+        :return: the result of every occupied tile
+        :rtype: list
+        """
+        occupied = self.occupied_tiles()
+        if self.executor is None or len(occupied) < 2:
+            return [method(loc) for loc in occupied]
+        size = -(-len(occupied) // self.workers)
+        blocks = [occupied[start:start + size] for start in range(0, len(occupied), size)]
+        results = self.executor.map(lambda block: [method(loc) for loc in block], blocks)
+        return [result for block in results for result in block]
+
+    def occupied_tiles(self):
+        """
+        A function that returns the tiles with animals on them.
+
+        :return: the occupied tiles, in the order of self.tiles
+        :rtype: list of Tile
+        """
+        return self.occupied
+
+    def mark_occupied(self, loc):
+        """
+        A function that adds a tile to the index of the tiles with animals on them, after
+        animals were placed directly on the tile instead of with add_animals.
+
+        :param loc: the tile that was given animals
+        :type loc: Tile
+        """
+        self.update_occupied([loc])
+
+    def update_occupied(self, tiles=None):
+        """
+        A function that updates the index of the tiles with animals on them. Only the tiles
+        that were occupied and the given tiles are checked, or every tile if none are given.
+
+        :param tiles: tiles that may have been given animals
+        :type tiles: iterable of Tile
+        """
+        if tiles is None:
+            candidates = self.tiles
+        else:
+            candidates = sorted(set(self.occupied).union(tiles), key=self.number.__getitem__)
+        self.occupied = [loc for loc in candidates if loc.herbs or loc.carns]
 
     def add_animals(self, population):
         """
@@ -358,6 +609,7 @@ class Island:
              {'species':'Carnivore','age':5, 'weight':20}]]
 
         """
+        added = []
         for animal_type in population:
             get_location = animal_type['loc']
             get_animals = animal_type['pop']
@@ -368,8 +620,128 @@ class Island:
                         loc.add_herb_to_tile(Herbivore(animal['weight'], animal['age']))
                     elif animal['species'] == 'Carnivore':
                         loc.add_carn_to_tile(Carnivore(animal['weight'], animal['age']))
+                added.append(loc)
             else:
                 raise ValueError('Inhabitable landscape')
+        self.update_occupied(added)
+
+    def num_animals_per_species(self):
+        """
+        A function that returns the number of animals of each species on the island, counted
+        on the occupied tiles, see occupied_tiles.
+
+        :return: e.g {'Herbivore': 20, 'Carnivore': 5}
+        :rtype: dict
+        """
+        occupied = self.occupied_tiles()
+        return {'Herbivore': sum(len(loc.herbs) for loc in occupied),
+                'Carnivore': sum(len(loc.carns) for loc in occupied)}
+
+    def animal_properties(self):
+        """
+        A function that collects the age, weight and fitness of every animal on the island.
+
+        :return: e.g {'Herbivore': {'age': [..], 'weight': [..], 'fitness': [..]}, ..}
+        :rtype: dict
+        """
+        properties = {'Herbivore': {'age': [], 'weight': [], 'fitness': []},
+                      'Carnivore': {'age': [], 'weight': [], 'fitness': []}}
+        for loc in self.occupied_tiles():
+            for species, animals in (('Herbivore', loc.herbs), ('Carnivore', loc.carns)):
+                properties[species]['age'] += [ani.age for ani in animals]
+                properties[species]['weight'] += [ani.weight for ani in animals]
+                properties[species]['fitness'] += [ani.fitness for ani in animals]
+        return properties
+
+    def density(self):
+        """
+        A function that counts the animals of each species on every tile of the island.
+
+        :return: e.g {'Herbivore': [[0, 0, 0], [0, 3, 0], ..], 'Carnivore': [..]}
+        :rtype: dict of nested lists
+        """
+        return {'Herbivore': [[len(loc.herbs) for loc in row] for row in self.map],
+                'Carnivore': [[len(loc.carns) for loc in row] for row in self.map]}
+
+    def summary(self):
+        """
+        A function that counts the animals of each species per landscape, and finds the mean
+        fitness of each species, in one pass over the tiles. At the end of a year the same
+        summary is found by the death pass, see year_summary.
+
+        :return: e.g {'Herbivore': {'L': 15, 'H': 5, 'D': 0, 'fitness': 0.6}, ..}
+        :rtype: dict
+        """
+        return self.summarize([(sum(herb.fitness for herb in loc.herbs),
+                                 sum(carn.fitness for carn in loc.carns))
+                                for loc in self.occupied_tiles()])
+
+    def summarize(self, fitness_sums):
+        """
+        A function that counts the animals of each species per landscape on the occupied
+        tiles, and finds the mean fitness of each species from the sums of the fitness.
+
+        :param fitness_sums: the sum of the fitness of the herbivores and the carnivores on
+                             every occupied tile, in the order of the tiles
+        :type fitness_sums: list of tuples
+        :return: e.g {'Herbivore': {'L': 15, 'H': 5, 'D': 0, 'fitness': 0.6}, ..}
+        :rtype: dict
+        """
+        summary = {'Herbivore': {'L': 0, 'H': 0, 'D': 0, 'fitness': 0},
+                   'Carnivore': {'L': 0, 'H': 0, 'D': 0, 'fitness': 0}}
+        for loc, (herb_fitness, carn_fitness) in zip(self.occupied_tiles(), fitness_sums):
+            summary['Herbivore'][loc.landscape.type] += len(loc.herbs)
+            summary['Herbivore']['fitness'] += herb_fitness
+            summary['Carnivore'][loc.landscape.type] += len(loc.carns)
+            summary['Carnivore']['fitness'] += carn_fitness
+        for counts in summary.values():
+            num = counts['L'] + counts['H'] + counts['D']
+            counts['fitness'] = counts['fitness'] / num if num else 0
+        return summary
+
+    def get_state(self):
+        """
+        A function that collects the animals on every tile in arrays, in the order they have
+        on the tiles, e.g. to save them in a checkpoint.
+
+        :return: the tile index, age, weight, fitness and stale flag of the fitness of every
+                 animal, per species, e.g {'Herbivore_age': array([5, 3, ..]), ..}
+        :rtype: dict of numpy arrays
+        """
+        state = {}
+        for species, attr in (('Herbivore', 'herbs'), ('Carnivore', 'carns')):
+            animals = [(num, ani) for num, loc in enumerate(self.tiles)
+                       for ani in getattr(loc, attr)]
+            state[f'{species}_tile'] = np.array([num for num, _ in animals], dtype=int)
+            state[f'{species}_age'] = np.array([ani.age for _, ani in animals], dtype=int)
+            state[f'{species}_weight'] = np.array([ani.weight for _, ani in animals],
+                                                  dtype=float)
+            state[f'{species}_fitness'] = np.array([ani.fitness for _, ani in animals],
+                                                   dtype=float)
+            state[f'{species}_stale'] = np.array([ani.fitness_update for _, ani in animals],
+                                                 dtype=bool)
+        return state
+
+    def set_state(self, state):
+        """
+        A function that replaces the animals on the island with the animals collected by
+        get_state.
+
+        :param state: the animals from get_state
+        :type state: dict of numpy arrays
+        """
+        for loc in self.tiles:
+            loc.herbs = []
+            loc.carns = []
+        for species, attr in (('Herbivore', 'herbs'), ('Carnivore', 'carns')):
+            for num, age, weight, fitness, stale in zip(
+                    *(state[f'{species}_{field}'].tolist()
+                      for field in ('tile', 'age', 'weight', 'fitness', 'stale'))):
+                ani = self.animals[species](weight, age)
+                ani.fitness = fitness
+                ani.fitness_update = stale
+                getattr(self.tiles[num], attr).append(ani)
+        self.update_occupied()
 
     def yearly_cycle(self):
         """
@@ -378,58 +750,70 @@ class Island:
         self.feeding()
         self.procreation()
         self.migration()
-        self.aging()
-        self.loss_of_weight()
+        self.end_of_year()
         self.death()
 
     def feeding(self):
         """
         A function that feeds all the animals on the island
         """
-        for loc in self.tiles:
-            if loc.landscape.food:
-                fodder = loc.landscape.f_max
-                loc.feed_herbs(fodder)
-            loc.feed_carns()
+        self.map_tiles(Tile.animals_eat)
 
     def procreation(self):
         """
         A function that calculates the births for all animals on the island, and adds them to
         their respective lists
         """
-        for loc in self.tiles:
-            loc.birth_animal()
+        self.map_tiles(Tile.birth_animal)
 
     def migration(self):
         """
         A function that calculates migration for all animals on the island, and adds them to their
-        respective lists
+        respective lists. Only the tiles that were given migrants integrate them.
         """
-        for row in self.map:
-            for loc in row:
-                loc.animals_migrate(loc, self.map)
+        pending = set()
+        for herb_moves, carn_moves in self.map_tiles(Tile.choose_migrants):
+            pending.update(Tile.send_migrants(herb_moves, carn_moves))
 
-        for row in self.map:
-            for loc in row:
-                loc.integrate()
+        for loc in pending:
+            loc.integrate()
+        self.update_occupied(pending)
 
     def aging(self):
         """
         A function that ages all animals on the island
         """
-        for loc in self.tiles:
-            loc.animals_age()
+        self.map_tiles(Tile.animals_age)
 
     def loss_of_weight(self):
         """
         A function that calculate the weight-loss of all the animals on the island
         """
-        for loc in self.tiles:
-            loc.animals_weight_loss()
+        self.map_tiles(Tile.animals_weight_loss)
+
+    def aging_and_loss_of_weight(self):
+        """
+        A function that ages all animals on the island and calculates their weight-loss, in
+        one pass over the tiles. It gives the same result as aging followed by loss_of_weight.
+        """
+        self.map_tiles(Tile.animals_age_and_weight_loss)
+
+    def end_of_year(self):
+        """
+        A function that ages all animals and calculates their weight-loss, in one pass if
+        fused_aging is set and otherwise with aging followed by loss_of_weight. Both give
+        the same result.
+        """
+        if self.fused_aging:
+            self.aging_and_loss_of_weight()
+        else:
+            self.aging()
+            self.loss_of_weight()
 
     def death(self):
         """
-        A function that calculates the deaths of the animals on the island
+        A function that calculates the deaths of the animals on the island, and keeps the
+        summary of the survivors in year_summary, see summary.
         """
-        for loc in self.tiles:
-            loc.animals_dead()
+        self.year_summary = self.summarize(self.map_tiles(Tile.animals_dead))
+        self.update_occupied(())
@@ -0,0 +1,75 @@
+"""
+A buffered csv writer for the yearly log of BioSim.
+
+The log file stays open while the simulation runs. Rows are kept in memory and written
+together when the buffer is full, when enough time has passed since the last write, or
+when the simulation asks for it.
+"""
+
+import csv
+import time
+
+
+class LogWriter:
+    """
+    Writes one row per simulated year to a csv file.
+    """
+    def __init__(self, path, columns, buffer_rows=100, flush_seconds=5.0):
+        """
+        :param path: the path of the log file
+        :type path: str
+        :param columns: the names of the columns
+        :type columns: list of str
+        :param buffer_rows: the number of rows kept before they are written
+        :type buffer_rows: int
+        :param flush_seconds: the longest time rows are kept before they are written
+        :type flush_seconds: float
+        """
+        self.file = open(path, 'w', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(columns)
+        self.file.flush()
+        self.buffer_rows = buffer_rows
+        self.flush_seconds = flush_seconds
+        self.rows = []
+        self.last_flush = time.monotonic()
+
+    def __enter__(self):
+        """
+        Lets the log be used in a with statement, which closes it at the end.
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, row):
+        """
+        A function that adds a row to the log. The buffered rows are written if the buffer is
+        full or if it has been kept for too long.
+
+        :param row: the values of the row
+        :type row: list
+        """
+        self.rows.append(row)
+        if len(self.rows) >= self.buffer_rows or \
+                time.monotonic() - self.last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        """
+        A function that writes the buffered rows to the file.
+        """
+        if self.rows:
+            self.writer.writerows(self.rows)
+            self.rows = []
+        self.file.flush()
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        """
+        A function that writes the buffered rows and closes the file.
+        """
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
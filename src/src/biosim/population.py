@@ -0,0 +1,447 @@
+"""
+A structure-of-arrays population backend for BioSim.
+
+Instead of one Python object per animal, every species keeps the age, weight, fitness
+and tile index of all its animals in contiguous NumPy arrays. The yearly cycle is
+carried out with array operations, following the same rules as :class:`biosim.island.Island`.
+"""
+
+import biosim.landscape as ls
+from biosim.animals import Herbivore, Carnivore
+from biosim.island import read_geography
+import numpy as np
+
+# The number of random numbers the carnivores draw from the generator at a time when hunting
+HUNT_CHUNK = 1024
+
+
+def random_numbers(rng, size=HUNT_CHUNK):
+    """
+    A generator that yields random numbers one at a time, drawn from the random number
+    generator in chunks, since a single number from a NumPy generator is slow to draw.
+
+    :param rng: the random number generator
+    :type rng: numpy.random.Generator
+    :param size: the number of random numbers drawn at a time
+    :type size: int
+    """
+    while True:
+        yield from rng.random(size).tolist()
+
+
+class Population:
+    """
+    Stores all animals of one species on the island in contiguous arrays.
+    """
+    def __init__(self, species):
+        """
+        :param species: the species stored in the population
+        :type species: Herbivore or Carnivore class
+        """
+        self.species = species
+        self.tile = np.empty(0, dtype=int)
+        self.age = np.empty(0, dtype=int)
+        self.weight = np.empty(0, dtype=float)
+        self.fitness = np.empty(0, dtype=float)
+        self.stale = np.empty(0, dtype=bool)
+
+    def __len__(self):
+        return len(self.weight)
+
+    def add(self, tile, age, weight):
+        """
+        A function that adds new animals to the population.
+
+        :param tile: the tile index of every new animal
+        :type tile: list or numpy array
+        :param age: the age of every new animal
+        :type age: list or numpy array
+        :param weight: the weight of every new animal
+        :type weight: list or numpy array
+        """
+        age = np.asarray(age, dtype=int)
+        weight = np.asarray(weight, dtype=float)
+        self.tile = np.concatenate((self.tile, np.asarray(tile, dtype=int)))
+        self.age = np.concatenate((self.age, age))
+        self.weight = np.concatenate((self.weight, weight))
+        self.fitness = np.concatenate((self.fitness, self.species.fitness_array(age, weight)))
+        self.stale = np.concatenate((self.stale, np.zeros(len(weight), dtype=bool)))
+
+    def select(self, index):
+        """
+        A function that keeps only the chosen animals, in the chosen order.
+
+        :param index: boolean mask or index array of the animals to keep
+        :type index: numpy array
+        """
+        self.tile = self.tile[index]
+        self.age = self.age[index]
+        self.weight = self.weight[index]
+        self.fitness = self.fitness[index]
+        self.stale = self.stale[index]
+
+    def update_fitness(self):
+        """
+        A function that recalculates the fitness of the animals marked as stale.
+        """
+        if self.stale.any():
+            stale = np.flatnonzero(self.stale)
+            self.fitness[stale] = self.species.fitness_array(self.age[stale], self.weight[stale])
+            self.stale[:] = False
+
+    def groups(self):
+        """
+        A function that sorts the population by tile and returns the slice of every tile.
+        The order of the animals within a tile is kept.
+
+        :return: (tile, start, stop) for every occupied tile
+        :rtype: list of tuples
+        """
+        self.select(np.argsort(self.tile, kind='stable'))
+        tiles, starts, counts = np.unique(self.tile, return_index=True, return_counts=True)
+        return list(zip(tiles, starts, starts + counts))
+
+
+class ArrayIsland:
+    """
+    Represents the Island for the simulation, with the animals stored as a
+    :class:`Population` per species.
+
+    self.destinations is a table of the tile a migrant from every tile moves to, when it
+    moves down, up, right or left, or -1 if that tile is outside the map or not traversable.
+    """
+    landscapes = (ls.Water, ls.Lowland, ls.Highland, ls.Desert)
+
+    def __init__(self, geogr, rng=None):
+        """
+        :param geogr: a multi-line string of landscape-codes
+        :type geogr: str
+        :param rng: the random number generator of the island
+        :type rng: numpy.random.Generator
+        :raises ValueError: If the map is invalid
+        """
+        rows = read_geography(geogr)
+        self.shape = (len(rows), len(rows[0]))
+        codes = [landscape.type for landscape in self.landscapes]
+        self.kinds = np.array([codes.index(code) for row in rows for code in row])
+        self.traversable = np.array([landscape.traversable
+                                     for landscape in self.landscapes])[self.kinds]
+        tiles = np.arange(self.kinds.size)
+        neighbours = self.neighbours(np.repeat(tiles, 4), np.tile(np.arange(4), tiles.size))
+        allowed = neighbours >= 0
+        allowed[allowed] = self.traversable[neighbours[allowed]]
+        self.destinations = np.where(allowed, neighbours, -1).reshape(tiles.size, 4)
+        self.rng = np.random.default_rng() if rng is None else rng
+        self.herbs = Population(Herbivore)
+        self.carns = Population(Carnivore)
+        self.populations = {'Herbivore': self.herbs,
+                            'Carnivore': self.carns}
+        # If False, the yearly cycle ages the animals and takes off their weight in two passes
+        self.fused_aging = True
+        # The summary of the animals at the end of the last year, found by death
+        self.year_summary = None
+
+    def add_animals(self, population):
+        """
+        A function that adds animals to the island
+
+        :param population: the animals that are being added to the island
+        :type population: list of dicts
+        :raises ValueError: If the location is inhabitable
+
+        .. note::
+            The list follows the same format as :meth:`biosim.island.Island.add_animals`
+        """
+        for animal_type in population:
+            row, col = animal_type['loc'][0] - 1, animal_type['loc'][1] - 1
+            tile = row * self.shape[1] + col
+            if not self.traversable[tile]:
+                raise ValueError('Inhabitable landscape')
+            for species, pop in self.populations.items():
+                animals = [animal for animal in animal_type['pop']
+                           if animal['species'] == species]
+                pop.add([tile] * len(animals),
+                        [animal['age'] for animal in animals],
+                        [animal['weight'] for animal in animals])
+
+    def num_animals_per_species(self):
+        """
+        A function that returns the number of animals of each species on the island.
+
+        :return: e.g {'Herbivore': 20, 'Carnivore': 5}
+        :rtype: dict
+        """
+        return {species: len(pop) for species, pop in self.populations.items()}
+
+    def animal_properties(self):
+        """
+        A function that returns the age, weight and fitness of every animal on the island.
+
+        :return: e.g {'Herbivore': {'age': array, 'weight': array, 'fitness': array}, ..}
+        :rtype: dict
+        """
+        return {species: {'age': pop.age, 'weight': pop.weight, 'fitness': pop.fitness}
+                for species, pop in self.populations.items()}
+
+    def density(self):
+        """
+        A function that counts the animals of each species on every tile of the island.
+
+        :return: e.g {'Herbivore': 2D array, 'Carnivore': 2D array}
+        :rtype: dict
+        """
+        return {species: np.bincount(pop.tile, minlength=self.kinds.size).reshape(self.shape)
+                for species, pop in self.populations.items()}
+
+    def summary(self):
+        """
+        A function that counts the animals of each species per landscape, and finds the mean
+        fitness of each species.
+
+        :return: e.g {'Herbivore': {'L': 15, 'H': 5, 'D': 0, 'fitness': 0.6}, ..}
+        :rtype: dict
+        """
+        return {species: self.species_summary(pop) for species, pop in self.populations.items()}
+
+    def species_summary(self, pop):
+        """
+        A function that counts the animals of one species per landscape, and finds their mean
+        fitness.
+
+        :param pop: the population of the species
+        :type pop: Population
+        :return: e.g {'L': 15, 'H': 5, 'D': 0, 'fitness': 0.6}
+        :rtype: dict
+        """
+        counts = np.bincount(self.kinds[pop.tile], minlength=len(self.landscapes))
+        summary = {landscape.type: int(counts[num])
+                   for num, landscape in enumerate(self.landscapes) if landscape.type != 'W'}
+        summary['fitness'] = float(pop.fitness.mean()) if len(pop) else 0
+        return summary
+
+    def neighbours(self, tile, direction):
+        """
+        A function that finds the tiles next to the given tiles.
+
+        :param tile: tile indices
+        :type tile: numpy array
+        :param direction: 0 is down, 1 is up, 2 is right and 3 is left
+        :type direction: numpy array
+        :return: the index of the neighbouring tile, or -1 outside the map
+        :rtype: numpy array
+        """
+        rows, cols = np.divmod(tile, self.shape[1])
+        rows = rows + np.array([1, -1, 0, 0])[direction]
+        cols = cols + np.array([0, 0, 1, -1])[direction]
+        inside = (rows >= 0) & (rows < self.shape[0]) & (cols >= 0) & (cols < self.shape[1])
+        return np.where(inside, rows * self.shape[1] + cols, -1)
+
+    def get_state(self):
+        """
+        A function that collects the arrays of both populations, e.g. to save them in a
+        checkpoint.
+
+        :return: the tile index, age, weight, fitness and stale flag of the fitness of every
+                 animal, per species, e.g {'Herbivore_age': array([5, 3, ..]), ..}
+        :rtype: dict of numpy arrays
+        """
+        return {f'{species}_{field}': getattr(pop, field)
+                for species, pop in self.populations.items()
+                for field in ('tile', 'age', 'weight', 'fitness', 'stale')}
+
+    def set_state(self, state):
+        """
+        A function that replaces the populations with the arrays collected by get_state.
+
+        :param state: the arrays from get_state
+        :type state: dict of numpy arrays
+        """
+        for species, pop in self.populations.items():
+            for field in ('tile', 'age', 'weight', 'fitness', 'stale'):
+                setattr(pop, field, np.array(state[f'{species}_{field}'],
+                                             dtype=getattr(pop, field).dtype))
+
+    def yearly_cycle(self):
+        """
+        A function that runs the annual cycle of the island
+        """
+        self.feeding()
+        self.procreation()
+        self.migration()
+        self.end_of_year()
+        self.death()
+
+    def feeding(self):
+        """
+        A function that feeds all the animals on the island. The herbivores eat in
+        descending order of fitness, then the carnivores hunt tile by tile.
+        """
+        herbs, carns = self.herbs, self.carns
+        herbs.update_fitness()
+        carns.update_fitness()
+        if len(herbs):
+            fodder = np.array([landscape.f_max if landscape.food else 0
+                               for landscape in self.landscapes])[self.kinds]
+            herbs.select(np.lexsort((-herbs.fitness, herbs.tile)))
+            rank = np.arange(len(herbs)) - np.searchsorted(herbs.tile, herbs.tile)
+            eaten = np.clip(fodder[herbs.tile] - rank * Herbivore.F, 0, Herbivore.F)
+            herbs.weight += Herbivore.beta * eaten
+            herbs.stale |= eaten > 0
+            herbs.update_fitness()
+
+        if len(herbs) and len(carns):
+            herbs.select(np.lexsort((herbs.fitness, herbs.tile)))
+            alive = np.ones(len(herbs), dtype=bool)
+            numbers = random_numbers(self.rng)
+            for tile, start, stop in carns.groups():
+                prey_start, prey_stop = np.searchsorted(herbs.tile, [tile, tile + 1])
+                if prey_start < prey_stop:
+                    alive[prey_start:prey_stop] = self.hunt(
+                        self.rng.permutation(np.arange(start, stop)), prey_start, prey_stop,
+                        numbers)
+            herbs.select(alive)
+
+    def hunt(self, hunters, prey_start, prey_stop, numbers):
+        """
+        A function for the carnivores hunting on one tile. Each carnivore hunts until it
+        is full, or has tried to kill every herbivore, in the same way as
+        :meth:`biosim.island.Tile.feed_carns`. The animals of the tile are copied to lists
+        once, and the weight and fitness of the carnivores are written back after the hunt.
+
+        :param hunters: the carnivores in the order they hunt
+        :type hunters: numpy array of indices
+        :param prey_start: the first herbivore on the tile, in increasing order of fitness
+        :type prey_start: int
+        :param prey_stop: the herbivore after the last one on the tile
+        :type prey_stop: int
+        :param numbers: the random numbers of the hunt, see random_numbers
+        :type numbers: iterator of float
+        :return: marks the herbivores on the tile that have not been killed
+        :rtype: list of bool
+        """
+        herbs, carns = self.herbs, self.carns
+        delta_phi_max = Carnivore.DeltaPhiMax
+        herb_fitness = herbs.fitness[prey_start:prey_stop].tolist()
+        herb_weight = herbs.weight[prey_start:prey_stop].tolist()
+        carn_age = carns.age[hunters].tolist()
+        carn_weight = carns.weight[hunters].tolist()
+        carn_fitness = carns.fitness[hunters].tolist()
+        alive = [True] * len(herb_fitness)
+        prey = list(range(len(herb_fitness)))
+        for num in range(len(carn_fitness)):
+            fitness, weight = carn_fitness[num], carn_weight[num]
+            herb_eaten = 0
+            killed = False
+            for herb in prey:
+                if fitness < herb_fitness[herb]:
+                    break
+                if fitness <= herb_fitness[herb]:
+                    continue
+                difference = fitness - herb_fitness[herb]
+                if difference < delta_phi_max and \
+                        difference / delta_phi_max <= next(numbers):
+                    continue
+                alive[herb] = False
+                killed = True
+                if herb_eaten < Carnivore.F:
+                    herb_eaten += herb_weight[herb]
+                    weight += Carnivore.beta * herb_weight[herb]
+                    fitness = Carnivore.fitness_of(carn_age[num], weight)
+                else:
+                    weight += Carnivore.beta * (Carnivore.F - herb_eaten)
+                    fitness = Carnivore.fitness_of(carn_age[num], weight)
+                    break
+            carn_fitness[num], carn_weight[num] = fitness, weight
+            if killed:
+                prey = [herb for herb in prey if alive[herb]]
+        carns.weight[hunters] = carn_weight
+        carns.fitness[hunters] = carn_fitness
+        return alive
+
+    def procreation(self):
+        """
+        A function that calculates the births for all animals on the island. The birth
+        probabilities of a species are found at once from the number of animals on every
+        tile, and the random numbers and the birth weights are drawn in one call each.
+        Newborns are not considered for birth in the same year.
+        """
+        for pop in self.populations.values():
+            species = pop.species
+            pop.update_fitness()
+            num = np.bincount(pop.tile, minlength=self.kinds.size)[pop.tile]
+            prob = np.where(pop.weight < species.zeta * (species.w_birth + species.sigma_birth), 0,
+                            np.minimum(1, species.gamma * pop.fitness * (num - 1)))
+            mothers = np.flatnonzero(self.rng.random(len(pop)) < prob)
+            birth_weight = self.rng.normal(species.w_birth, species.sigma_birth, len(mothers))
+            mothers, birth_weight = mothers[birth_weight > 0], birth_weight[birth_weight > 0]
+            pop.weight[mothers] -= species.xi * birth_weight
+            pop.stale[mothers] = True
+            pop.update_fitness()
+            pop.add(pop.tile[mothers], np.zeros(len(mothers), dtype=int), birth_weight)
+
+    def migration(self):
+        """
+        A function that calculates migration for all animals on the island. The decisions and
+        the directions of a species are drawn in one call each, and every migrant is moved
+        from the tile it had at the start of the phase, so it migrates at most once a year.
+        """
+        for pop in self.populations.values():
+            pop.update_fitness()
+            moving = np.flatnonzero(pop.species.mu * pop.fitness >= self.rng.random(len(pop)))
+            new_tile = self.destinations[pop.tile[moving], self.rng.integers(4, size=len(moving))]
+            allowed = new_tile >= 0
+            pop.tile[moving[allowed]] = new_tile[allowed]
+
+    def end_of_year(self):
+        """
+        A function that ages all animals and calculates their weight-loss, in one pass if
+        fused_aging is set and otherwise with aging followed by loss_of_weight. Both give
+        the same result.
+        """
+        if self.fused_aging:
+            self.aging_and_loss_of_weight()
+        else:
+            self.aging()
+            self.loss_of_weight()
+
+    def aging(self):
+        """
+        A function that ages all animals on the island
+        """
+        for pop in self.populations.values():
+            pop.age += 1
+            pop.stale[:] = True
+
+    def loss_of_weight(self):
+        """
+        A function that calculate the weight-loss of all the animals on the island
+        """
+        for pop in self.populations.values():
+            pop.weight -= pop.species.eta * pop.weight
+            pop.stale[:] = True
+            pop.update_fitness()
+
+    def aging_and_loss_of_weight(self):
+        """
+        A function that ages all animals on the island and calculates their weight-loss,
+        with one array operation for each. It gives the same result as aging followed by
+        loss_of_weight. The fitness is recalculated when it is next used.
+        """
+        for pop in self.populations.values():
+            pop.age += 1
+            pop.weight -= pop.species.eta * pop.weight
+            pop.stale[:] = True
+
+    def death(self):
+        """
+        A function that calculates the deaths of all animals on the island, with one array of
+        random numbers per species, and keeps the survivors in one step. The summary of the
+        survivors is kept in year_summary.
+        """
+        self.year_summary = {}
+        for species, pop in self.populations.items():
+            pop.update_fitness()
+            dead = (pop.weight <= 0) | \
+                   (self.rng.random(len(pop)) < pop.species.omega * (1 - pop.fitness))
+            pop.select(~dead)
+            self.year_summary[species] = self.species_summary(pop)
@@ -6,14 +6,36 @@ Template for BioSim class.
 # https://opensource.org/licenses/BSD-3-Clause
 # (C) Copyright 2021 Hans Ekkehard Plesser / NMBU
 
-from biosim.island import Island
+from biosim.island import Island, get_parameters, set_parameters
+from biosim.population import ArrayIsland
+from biosim.domains import DomainIsland
 from biosim.landscape import Lowland, Highland, Water, Desert
 from biosim.animals import Herbivore, Carnivore
-from biosim.visuals import Visual
+from biosim.logger import LogWriter
+from biosim.streams import get_states, set_states
+from concurrent.futures import ProcessPoolExecutor
+import json
 import random
-import csv
-import matplotlib
-matplotlib.use("TkAgg")
+import numpy as np
+
+
+def _run_replicate(island_map, ini_pop, seed, num_years, parameters, backend):
+    """
+    A function that runs one replicate in a worker process. The class parameters of the
+    worker are set first, since they are not shared with the process that started it.
+
+    :return: the number of herbivores and carnivores at the start and after every year
+    :rtype: numpy array of shape (num_years + 1, 2)
+    """
+    set_parameters(parameters)
+    sim = BioSim(island_map, ini_pop, seed, vis_years=0, backend=backend)
+    counts = np.zeros((num_years + 1, 2), dtype=int)
+    for year in range(num_years + 1):
+        if year > 0:
+            sim.simulate(1)
+        num_animals = sim.num_animals_per_species
+        counts[year] = num_animals['Herbivore'], num_animals['Carnivore']
+    return counts
 
 
 class BioSim:
@@ -23,7 +45,8 @@ class BioSim:
     def __init__(self, island_map, ini_pop, seed,
                  vis_years=1, ymax_animals=None, cmax_animals=None, hist_specs=None,
                  img_dir=None, img_base=None, img_fmt='png', img_years=None,
-                 log_file=None):
+                 log_file=None, backend='objects', log_detail=False, workers=None,
+                 blocks=None, render_queue=None, blit=False, movie_file=None):
         """
         :param island_map: Multi-line string specifying island geography
         :param ini_pop: List of dictionaries specifying initial population
@@ -37,6 +60,23 @@ class BioSim:
         :param img_fmt: String with file type for figures, e.g. 'png'
         :param img_years: years between visualizations saved to files (default: vis_years)
         :param log_file: If given, write animal counts to this file
+        :param backend: 'objects' stores every animal as a Python object, 'arrays' stores
+                        each species in NumPy arrays (see :mod:`biosim.population`)
+        :param log_detail: If True, also log the animals per landscape and the mean fitness
+        :param workers: If given, the number of threads the tiles are split between ('objects'
+                        backend only). Every tile then draws from its own random number
+                        generator, so the results are the same for any number of workers.
+        :param blocks: If given, the number of blocks of (rows, columns) the island is split
+                       into, each simulated in its own worker process ('objects' backend
+                       only). The results are the same as with workers.
+        :param render_queue: If given, the graphics are drawn and saved by a renderer thread,
+                             and up to this many years wait in a queue for it. This needs a
+                             non-interactive matplotlib backend, e.g. Agg, and
+                             raises ValueError otherwise.
+        :param blit: If True, the figure is only drawn in full when its axes change, and
+                     otherwise only the parts that change every year are drawn
+        :param movie_file: If given, the images are piped to ffmpeg and encoded to this movie
+                           file, ending in .mp4 or .gif, while simulating (see make_movie)
 
         If ymax_animals is None, the y-axis limit should be adjusted automatically.
         If cmax_animals is None, fixed default values should be used.
@@ -46,15 +86,23 @@ class BioSim:
         hist_specs is a dictionary with one entry per property for which a histogram shall be shown.
         For each property, a dictionary providing the maximum value and the bin width must be given.
 
-        If img_dir is None, no figures are written to file. Filenames are formed as
+        If img_dir is None, no figures are written to file. A movie_file does not need
+        the figures to be written. Filenames are formed as
             f'{os.path.join(img_dir, img_base}_{img_number:05d}.{img_fmt}'
         where img_number are consecutive image numbers starting from 0.
 
         img_dir and img_base must either be both None or both strings.
+
+        The log file stays open while the simulation exists, and rows are written in batches.
+        All rows are written when simulate returns, and the file is closed by close().
+
+        Every simulation draws from its own random number generator, seeded with seed, so
+        several simulations can run side by side. Both backends follow the same rules, but
+        draw their random numbers differently, so they give different results for the same seed.
         """
-        random.seed(seed)
-        Carnivore.instance_count = 0
-        Herbivore.instance_count = 0
+        self.island_map = island_map
+        self.seed = seed
+        self.backend = backend
         self.vis_years = vis_years
 
         if ymax_animals is None:
@@ -68,10 +116,13 @@ class BioSim:
         else:
             self.cmax_animals = cmax_animals
 
+        self.renderer = None
         if self.vis_years != 0:
+            from biosim.visuals import Visual, Renderer
             self.graphics = Visual(island_map, img_years, vis_years, ymax=self.ymax_animals,
                                    img_dir=img_dir, img_name=img_base,
-                                   img_fmt=img_fmt, img_base=img_base, hist_specs=hist_specs)
+                                   img_fmt=img_fmt, img_base=img_base, hist_specs=hist_specs,
+                                   blit=blit, movie_file=movie_file)
             self.vis_years = vis_years
             self.img_dir = img_dir
             self.img_base = img_base
@@ -82,17 +133,47 @@ class BioSim:
             else:
                 self.img_years = img_years
 
+            if render_queue is not None:
+                self.renderer = Renderer(self.graphics, render_queue)
+
         self.log_file = log_file
+        self.log_detail = log_detail
+        self.log = None
         if self.log_file is not None:
-            with open(f'Results/{log_file}', 'w') as f:
-                writer = csv.writer(f)
-                writer.writerow(['Year', 'Herbivores', 'Carnivores'])
+            columns = ['Year', 'Herbivores', 'Carnivores']
+            if self.log_detail:
+                columns += [f'{name}_{landscape}' for name in ('Herbivores', 'Carnivores')
+                            for landscape in ('L', 'H', 'D')]
+                columns += ['Fitness_Herbivores', 'Fitness_Carnivores']
+            self.log = LogWriter(f'Results/{log_file}', columns)
 
-        self.island = Island(island_map)
-        self.tiles = self.island.tiles
+        self.workers = workers
+        self.blocks = blocks
+        if (workers is not None or blocks is not None) and backend != 'objects':
+            raise ValueError('Workers are only used by the objects backend')
+        if workers is not None and blocks is not None:
+            raise ValueError('Use either worker threads or blocks')
+        if backend == 'objects' and blocks is not None:
+            # The blocks only draw from the streams of their tiles; this generator is only
+            # kept so checkpoints have the same format for every objects simulation
+            self.rng = random.Random(seed)
+            self.island = DomainIsland(island_map, seed, blocks)
+        elif backend == 'objects':
+            self.rng = random.Random(seed)
+            self.island = Island(island_map, rng=self.rng)
+            self.tiles = self.island.tiles
+            if workers is not None:
+                self.island.use_tile_streams(seed)
+                self.island.use_workers(workers)
+        elif backend == 'arrays':
+            self.rng = np.random.default_rng(seed)
+            self.island = ArrayIsland(island_map, rng=self.rng)
+        else:
+            raise ValueError('Unknown backend: ' + backend)
 
         self.add_population(ini_pop)
         self.current_year = 0
+        self.observers = []
 
     @staticmethod
     def set_animal_parameters(species, params):
@@ -124,60 +205,213 @@ class BioSim:
 
     def simulate(self, num_years):
         """
-        Runs simulation while visualizing the result.
+        Runs simulation while visualizing the result. The log is written up to the last
+        simulated year, also if the simulation stops with an error.
         """
         if self.vis_years != 0:
-            self.graphics.setup(self.current_year, num_years)
-
-        for year in range(num_years):
-            self.current_year += 1
-            herb_col = []
-            carn_col = []
-
-            herb_age = []
-            carn_age = []
-            herb_fitness = []
-            carn_fitness = []
-            herb_weight = []
-            carn_weight = []
-            for tile in self.island.tiles:
-                herb_age += [ani.age for ani in tile.herbs]
-                carn_age += [ani.age for ani in tile.carns]
-                herb_fitness += [ani.fitness for ani in tile.herbs]
-                carn_fitness += [ani.fitness for ani in tile.carns]
-                herb_weight += [ani.weight for ani in tile.herbs]
-                carn_weight += [ani.weight for ani in tile.carns]
-
-            for row in self.island.map:
-                herb_ins = []
-                carn_ins = []
-                for an in row:
-                    herb_ins.append(len(an.herbs))
-                    carn_ins.append(len(an.carns))
-                herb_col.append(herb_ins)
-                carn_col.append(carn_ins)
-
-            if self.vis_years != 0:
-                if self.current_year % self.vis_years == 0:
-                    self.graphics.update(num_years=num_years, printed_year=self.current_year,
-                                         herbs=Herbivore.instance_count, carns=Carnivore.instance_count,
-                                         herb_col=herb_col, carn_col=carn_col,
-                                         fit_herb=herb_fitness, fit_carns=carn_fitness,
-                                         age_herbs=herb_age, age_carns=carn_age,
-                                         weight_herbs=herb_weight, weight_carns=carn_weight, cmax=self.cmax_animals,
-                                         ymax=self.ymax_animals)
-
-            self.island.yearly_cycle()
-
-            if self.vis_years != 0:
-                if self.current_year % self.img_years == 0:
-                    self.graphics.save_plot()
-
-            if self.log_file is not None:
-                with open(f'Results/{self.log_file}', 'a') as f:
-                    writer = csv.writer(f)
-                    writer.writerow([self.current_year, Herbivore.instance_count,
-                                     Carnivore.instance_count])
+            self.render('setup', self.current_year, num_years)
+
+        try:
+            for year in range(num_years):
+                self.current_year += 1
+                observers = [observer for observer, years in self.observers
+                             if self.current_year % years == 0]
+                visualize = self.vis_years != 0 and self.current_year % self.vis_years == 0
+
+                if observers or visualize:
+                    statistics = self.statistics()
+                    for observer in observers:
+                        observer(self.current_year, statistics)
+
+                if visualize:
+                    num_animals = statistics['num_animals']
+                    properties = statistics['properties']
+                    density = statistics['density']
+                    snapshot = self.graphics.snapshot(
+                        num_years=num_years, printed_year=self.current_year,
+                        herbs=num_animals['Herbivore'],
+                        carns=num_animals['Carnivore'],
+                        herb_col=density['Herbivore'],
+                        carn_col=density['Carnivore'],
+                        fit_herb=properties['Herbivore']['fitness'],
+                        fit_carns=properties['Carnivore']['fitness'],
+                        age_herbs=properties['Herbivore']['age'],
+                        age_carns=properties['Carnivore']['age'],
+                        weight_herbs=properties['Herbivore']['weight'],
+                        weight_carns=properties['Carnivore']['weight'],
+                        cmax=self.cmax_animals,
+                        ymax=self.ymax_animals)
+                    self.render('draw', snapshot)
+
+                self.island.yearly_cycle()
+
+                if self.vis_years != 0:
+                    if self.current_year % self.img_years == 0:
+                        self.render('save_plot')
+
+                if self.log is not None:
+                    self.log.write(self.log_row())
+        finally:
+            if self.log is not None:
+                self.log.flush()
+        if self.renderer is not None:
+            self.renderer.wait()
+
+    def render(self, method, *args):
+        """
+        Calls a method of the graphics, or puts the call in the queue of the renderer thread.
+
+        :param method: the name of the method of Visual
+        """
+        if self.renderer is not None:
+            self.renderer.submit(method, *args)
+        else:
+            getattr(self.graphics, method)(*args)
+
+    def log_row(self):
+        """
+        Makes the row of the log for the current year. The details are taken from the
+        summary that the island keeps from the death pass of the year.
+
+        :return: year, herbivores, carnivores, and with log_detail the animals per landscape
+                 and the mean fitness of each species
+        :rtype: list
+        """
+        if not self.log_detail:
+            num_animals = self.island.num_animals_per_species()
+            return [self.current_year, num_animals['Herbivore'], num_animals['Carnivore']]
+        summary = self.island.year_summary
+        row = [self.current_year]
+        row += [sum(summary[species][landscape] for landscape in ('L', 'H', 'D'))
+                for species in ('Herbivore', 'Carnivore')]
+        row += [summary[species][landscape] for species in ('Herbivore', 'Carnivore')
+                for landscape in ('L', 'H', 'D')]
+        row += [summary['Herbivore']['fitness'], summary['Carnivore']['fitness']]
+        return row
+
+    def __enter__(self):
+        """
+        Lets the simulation be used in a with statement, which closes it at the end.
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Writes the rest of the log, closes the log file and shuts down the worker threads or
+        processes and the renderer. An error of the renderer is raised after the rest is
+        shut down.
+        """
+        if self.log is not None:
+            self.log.close()
+        if self.workers is not None:
+            self.island.use_workers(1)
+        if self.blocks is not None:
+            self.island.close()
+        if self.renderer is not None:
+            self.renderer.close()
+        if self.vis_years != 0:
+            self.graphics.close_movie()
+
+    def statistics(self):
+        """
+        Collects the statistics of the island in its current state.
+
+        :return: {'num_animals': animals per species,
+                  'properties': age, weight and fitness of every animal per species,
+                  'density': animals on every tile per species}
+        :rtype: dict
+        """
+        return {'num_animals': self.island.num_animals_per_species(),
+                'properties': self.island.animal_properties(),
+                'density': self.island.density()}
+
+    def add_observer(self, observer, years=1):
+        """
+        Registers a function that is given the statistics of the island every given number of
+        years, as observer(year, statistics). The statistics are only collected in years where
+        the graphics or an observer use them.
+
+        :param observer: function to call
+        :param years: years between calls
+        """
+        self.observers.append((observer, years))
+
+    @staticmethod
+    def run_replicates(island_map, ini_pop, seeds, num_years, processes=None,
+                       backend='objects'):
+        """
+        Runs the same island once for every seed, spread over a pool of processes, without
+        graphics. The current animal and landscape parameters are used in every replicate.
+
+        :param island_map: Multi-line string specifying island geography
+        :param ini_pop: List of dictionaries specifying initial population
+        :param seeds: the seed of every replicate
+        :param num_years: the number of years to simulate
+        :param processes: the number of worker processes (default: number of CPUs)
+        :param backend: 'objects' or 'arrays', see BioSim
+        :return: the number of herbivores [.., 0] and carnivores [.., 1] at the start and
+                 after every year, for every seed
+        :rtype: numpy array of shape (len(seeds), num_years + 1, 2)
+        """
+        parameters = get_parameters()
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            replicates = [executor.submit(_run_replicate, island_map, ini_pop, seed, num_years,
+                                          parameters, backend)
+                          for seed in seeds]
+            return np.array([replicate.result() for replicate in replicates])
+
+    def save_checkpoint(self, path):
+        """
+        Saves the state of the simulation in a compressed NumPy file (.npz): the island map,
+        the animals on every tile, the species and landscape parameters, the year and the
+        state of the random number generators. The graphics and the log are not saved.
+
+        :param path: the path of the checkpoint, .npz is added if it has no such ending
+        """
+        if self.log is not None:
+            self.log.flush()
+        simulation = {'island_map': self.island_map, 'seed': self.seed,
+                      'backend': self.backend, 'current_year': self.current_year,
+                      'parameters': get_parameters()}
+        arrays = {'simulation': np.array(json.dumps(simulation))}
+        arrays.update(self.island.get_state())
+        for key, value in get_states([self.rng]).items():
+            arrays[f'rng_{key}'] = value
+        if self.backend == 'objects':
+            for key, value in self.island.get_tile_states().items():
+                arrays[f'tile_rng_{key}'] = value
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load_checkpoint(cls, path, **kwargs):
+        """
+        Creates a simulation from a checkpoint saved by save_checkpoint, and sets the species
+        and landscape parameters of the checkpoint. The loaded simulation continues exactly
+        as the saved simulation would have done.
+
+        :param path: the path of the checkpoint
+        :param kwargs: the graphics and log options, see BioSim
+        :return: the simulation
+        :rtype: BioSim
+        """
+        with np.load(path) as data:
+            arrays = dict(data)
+        simulation = json.loads(str(arrays['simulation']))
+        set_parameters(simulation['parameters'])
+        sim = cls(simulation['island_map'], [], simulation['seed'],
+                  backend=simulation['backend'], **kwargs)
+        sim.current_year = simulation['current_year']
+        sim.island.set_state(arrays)
+        set_states([sim.rng], {key[len('rng_'):]: value for key, value in arrays.items()
+                               if key.startswith('rng_')})
+        if 'tile_rng_internal' in arrays:
+            sim.island.set_tile_states({key[len('tile_rng_'):]: value
+                                        for key, value in arrays.items()
+                                        if key.startswith('tile_rng_')})
+        return sim
 
     def add_population(self, population):
         """
@@ -195,17 +429,17 @@ class BioSim:
     @property
     def num_animals(self):
         """Total number of animals on island."""
-        return Carnivore.instance_count + Herbivore.instance_count
+        return sum(self.island.num_animals_per_species().values())
 
     @property
     def num_animals_per_species(self):
         """Number of animals per species in island, as dictionary."""
-        num_herbs = Herbivore.instance_count
-        num_carns = Carnivore.instance_count
-        ani_per_species = {'Herbivore': num_herbs,
-                           'Carnivore': num_carns}
-        return ani_per_species
+        return self.island.num_animals_per_species()
 
     def make_movie(self):
-        """Create MPEG4 movie from visualization images saved."""
+        """
+        Create MPEG4 movie from visualization images saved, or finish the movie_file.
+        """
+        if self.renderer is not None:
+            self.renderer.wait()
         self.graphics.make_movie()
@@ -0,0 +1,89 @@
+"""
+Random number streams for BioSim.
+
+Every simulation owns its own generator, which is handed on to the island, the tiles and
+the animals, so several simulations can run in one process without sharing random numbers.
+The object backend draws one number at a time and uses :class:`random.Random`, the array
+backend draws arrays of numbers and uses :class:`numpy.random.Generator`.
+
+Substreams, e.g. one per tile or one per worker, are derived from the seed with
+:class:`numpy.random.SeedSequence`. They only depend on the seed and their position, not on
+the order in which they are used, so parallel runs stay reproducible.
+
+The states of the generators can be collected in arrays and set again, so a simulation can
+be saved in a checkpoint and continued with the same random numbers.
+"""
+
+import json
+import random
+import numpy as np
+
+
+def substreams(seed, num, generator=random.Random):
+    """
+    A function that derives independent random number generators from one seed.
+
+    :param seed: the seed of the simulation
+    :type seed: int
+    :param num: the number of generators, e.g. the number of tiles or workers
+    :type num: int
+    :param generator: random.Random for the object backend or numpy.random.default_rng for
+                      the array backend
+    :type generator: class or function
+    :return: num generators
+    :rtype: list
+    """
+    return [substream(seed, position, generator) for position in range(num)]
+
+
+def substream(seed, position, generator=random.Random):
+    """
+    A function that derives one of the generators of substreams, without deriving the ones
+    before it, e.g. for the tiles of one part of the island.
+
+    :param seed: the seed of the simulation
+    :type seed: int
+    :param position: the position of the generator, e.g. the number of the tile
+    :type position: int
+    :param generator: random.Random or numpy.random.default_rng
+    :type generator: class or function
+    :return: the same generator as substreams(seed, num, generator)[position]
+    """
+    child = np.random.SeedSequence(seed, spawn_key=(position,))
+    return generator(int.from_bytes(child.generate_state(4).tobytes(), 'little'))
+
+
+def get_states(rngs):
+    """
+    A function that collects the states of random number generators in arrays, e.g. to save
+    them in a checkpoint.
+
+    :param rngs: generators of the same kind, random.Random or numpy.random.Generator
+    :type rngs: list
+    :return: the states, {'internal': .., 'gauss': ..} for random.Random and {'state': ..}
+             for numpy.random.Generator
+    :rtype: dict of numpy arrays
+    """
+    if isinstance(rngs[0], np.random.Generator):
+        return {'state': np.array([json.dumps(rng.bit_generator.state) for rng in rngs])}
+    states = [rng.getstate() for rng in rngs]
+    return {'internal': np.array([state[1] for state in states], dtype=np.uint32),
+            'gauss': np.array([np.nan if state[2] is None else state[2] for state in states])}
+
+
+def set_states(rngs, states):
+    """
+    A function that sets the states of random number generators, as collected by get_states.
+
+    :param rngs: generators of the same kind as the ones the states were collected from
+    :type rngs: list
+    :param states: the states from get_states
+    :type states: dict of numpy arrays
+    """
+    if 'state' in states:
+        for rng, state in zip(rngs, states['state']):
+            rng.bit_generator.state = json.loads(str(state))
+    else:
+        for rng, internal, gauss in zip(rngs, states['internal'], states['gauss']):
+            rng.setstate((random.Random.VERSION, tuple(internal.tolist()),
+                          None if np.isnan(gauss) else float(gauss)))
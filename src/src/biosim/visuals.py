@@ -1,18 +1,75 @@
-import matplotlib.pyplot as plt
+"""
+The graphics of BioSim. The module is only imported by simulations that show or save
+graphics, so simulations without graphics do not load matplotlib.
+"""
+
+import matplotlib
 import numpy as np
 import os
+import queue
 import subprocess
+import sys
+import threading
+
+
+def choose_backend():
+    """
+    A function that picks the matplotlib backend: the backend in MPLBACKEND if it is set,
+    Agg if there is no display to draw on, and TkAgg otherwise.
+
+    :return: the name of the backend
+    :rtype: str
+    """
+    if os.environ.get('MPLBACKEND'):
+        return os.environ['MPLBACKEND']
+    if sys.platform.startswith('linux') and not (os.environ.get('DISPLAY') or
+                                                 os.environ.get('WAYLAND_DISPLAY')):
+        return 'Agg'
+    return 'TkAgg'
+
+
+def interactive_backend():
+    """
+    A function that tells if the current matplotlib backend draws in a window.
+
+    :return: False for backends such as Agg that only draw images
+    :rtype: bool
+    """
+    try:
+        from matplotlib.backends import backend_registry, BackendFilter
+        non_interactive = backend_registry.list_builtin(BackendFilter.NON_INTERACTIVE)
+    except ImportError:
+        from matplotlib.rcsetup import non_interactive_bk as non_interactive
+    return matplotlib.get_backend().lower() not in [name.lower() for name in non_interactive]
+
+
+matplotlib.use(choose_backend())
+import matplotlib.pyplot as plt  # noqa: E402
 
 
 class Visual:
     def __init__(self, island_map, img_step, step, ymax, hist_specs=None, img_name=None,
-                 img_dir=None, img_fmt=None, img_base=None, movie_fmt=None):
+                 img_dir=None, img_fmt=None, img_base=None, movie_fmt=None, blit=False,
+                 movie_file=None):
+        """
+        With blit, the figure is drawn in full only when the axes change, and otherwise only
+        the lines, density maps, histogram steps and year are drawn over a saved background.
+        With movie_file, the saved frames are encoded to this movie by a MovieWriter.
+        """
 
         self.island_map = island_map
+        self.blit = blit
+        self.background = None
+        self.movie_file = movie_file
+        self.movie_writer = None
         self.hist_specs = hist_specs
         self.ymax = ymax
 
         self.step = step
+        if hist_specs is None:
+            hist_specs = {'weight': {'max': 80, 'delta': 2},
+                          'fitness': {'max': 1.0, 'delta': 0.05},
+                          'age': {'max': 80, 'delta': 2}}
         self.hist_specs = hist_specs
         self.img_step = img_step
 
@@ -43,6 +100,8 @@ class Visual:
         self.fig = None
         self.graph_ax = None
         self.map_ax = None
+        self.map_img = None
+        self.map_axlg = None
         self.line1 = None
         self.line2 = None
         self.herbs_col = None
@@ -60,15 +119,20 @@ class Visual:
         if self.fig is None:
             self.fig = plt.figure(figsize=(12,6))#figsize=(12,8)
 
+        if self.movie_file is not None and self.movie_writer is None:
+            self.movie_writer = MovieWriter(self.fig, self.movie_file)
+
         self.fig.tight_layout()
 
         if self.map_ax is None:
             self.map_ax = self.fig.add_subplot(5, 3, (1,4)) #(10,3,(1,10))
+        self.show_map()
 
         if self.graph_ax is None:
             self.graph_ax = self.fig.add_subplot(5, 3, (3,6)) #(10,3,(3,12))
             self.graph_ax.set_title('Graph Animals')
 
+        self.background = None
         self.graph_ax.set_xlim(0, printed_year + num_years + 1)
         self.graph_ax.set_ylim(0, self.ymax)
 
@@ -87,18 +151,11 @@ class Visual:
             self.carns_col.set_title('Carnivore distribution')
             self.carn_axis = None
 
-        if self.hist_specs is None:
-            self.hist_specs = {'weight': {'max': 80, 'delta': 2},
-                               'fitness': {'max': 1.0, 'delta': 0.05},
-                               'age': {'max': 80, 'delta': 2}}
-
         if self.fitness_hist is None:
             self.fitness_hist = self.fig.add_subplot(5, 3, 13)# (10,3,(22,28)
             self.fitness_hist.set_title('Fitness')
             self.fitness_hist.set_ylim(0, self.ymax)
-            fitness_value = self.hist_specs['fitness']
-            n_points = int(round(fitness_value['max'] / fitness_value['delta'])) + 1
-            self.fitness_lim = np.linspace(0, fitness_value['max'], num=n_points)
+            self.fitness_lim = self.bin_edges('fitness')
             self.fitness_step_herb = self.fitness_hist.step(self.fitness_lim[:-1],
                                                             np.zeros_like(self.fitness_lim[:-1]))[0]
             self.fitness_step_carns = self.fitness_hist.step(self.fitness_lim[:-1],
@@ -108,9 +165,7 @@ class Visual:
             self.age_hist = self.fig.add_subplot(5, 3, 14)#(10,3,(23,29))
             self.age_hist.set_title('Age')
             self.age_hist.set_ylim(0, self.ymax)
-            age_value = self.hist_specs['age']
-            n_points = int(round(age_value['max'] / age_value['delta'])) + 1
-            self.age_lim = np.linspace(0, age_value['max'], num=n_points)
+            self.age_lim = self.bin_edges('age')
             self.age_step_herb = self.age_hist.step(self.age_lim[:-1],
                                                     np.zeros_like(self.age_lim[:-1]))[0]
             self.age_step_carns = self.age_hist.step(self.age_lim[:-1],
@@ -120,9 +175,7 @@ class Visual:
             self.weight_hist = self.fig.add_subplot(5, 3, 15)#(10,3,(24,30))
             self.weight_hist.set_title('Weight')
             self.weight_hist.set_ylim(0, self.ymax)
-            weight_value = self.hist_specs['weight']
-            n_points = int(round(weight_value['max'] / weight_value['delta'])) + 1
-            self.weight_lim = np.linspace(0, weight_value['max'], num=n_points)
+            self.weight_lim = self.bin_edges('weight')
             self.weight_step_herb = self.weight_hist.step(self.weight_lim[:-1],
                                                           np.zeros_like(self.weight_lim[:-1]))[0]
             self.weight_step_carns = self.weight_hist.step(self.weight_lim[:-1],
@@ -139,32 +192,34 @@ class Visual:
                                 verticalalignment='center',
                                 transform=axt.transAxes)  # relative coordinates
 
-    def update_fitness_hist(self, herbs, carns, ymax):
-        counts_herbs = np.histogram(herbs, self.fitness_lim)[0]
-        counts_carns = np.histogram(carns, self.fitness_lim)[0]
-        if max(counts_carns) > ymax or max(counts_herbs) > ymax:
-            ymax = max(max(counts_carns), max(counts_herbs)) * 1.2
-            self.fitness_hist.set_ylim(0, ymax)
-        self.fitness_step_herb.set_ydata(counts_herbs)
-        self.fitness_step_carns.set_ydata(counts_carns)
+        # The window is only shown by plt.pause, which blitting does not call
+        if self.blit and interactive_backend():
+            plt.show(block=False)
 
-    def update_age_hist(self, herbs, carns, ymax):
-        counts_herbs = np.histogram(herbs, self.age_lim)[0]
-        counts_carns = np.histogram(carns, self.age_lim)[0]
-        if max(counts_carns) > ymax or max(counts_herbs) > ymax:
-            ymax = max(max(counts_carns), max(counts_herbs)) * 1.2
-            self.age_hist.set_ylim(0, ymax)
-        self.age_step_herb.set_ydata(counts_herbs)
-        self.age_step_carns.set_ydata(counts_carns)
+    def bin_edges(self, prop):
+        """
+        Finds the edges of the bins of the histogram of a property, from the hist_specs.
+
+        :param prop: 'fitness', 'age' or 'weight'
+        :return: the edges of the bins
+        :rtype: numpy array
+        """
+        value = self.hist_specs[prop]
+        n_points = int(round(value['max'] / value['delta'])) + 1
+        return np.linspace(0, value['max'], num=n_points)
 
-    def update_weight_hist(self, herbs, carns, ymax):
-        counts_herbs = np.histogram(herbs, self.weight_lim)[0]
-        counts_carns = np.histogram(carns, self.weight_lim)[0]
+    @staticmethod
+    def update_hist(hist, step_herb, step_carns, counts_herbs, counts_carns, ymax):
+        """
+        Updates the steps of a histogram with the counts of each species, and raises the
+        y-axis limit if a count is above the current limit.
+        """
+        ymax = max(ymax, hist.get_ylim()[1])
         if max(counts_carns) > ymax or max(counts_herbs) > ymax:
             ymax = max(max(counts_carns), max(counts_herbs)) * 1.2
-            self.weight_hist.set_ylim(0, ymax)
-        self.weight_step_herb.set_ydata(counts_herbs)
-        self.weight_step_carns.set_ydata(counts_carns)
+            hist.set_ylim(0, ymax)
+        step_herb.set_ydata(counts_herbs)
+        step_carns.set_ydata(counts_carns)
 
     def update_herb_col(self, sys_map, cmax):
         """
@@ -199,6 +254,12 @@ class Visual:
 
     # This function is a modified version of the mapping.py file in inf200-course-materials
     def show_map(self):
+        """
+        Draws the landscape of the island and its legend. The map does not change, so it is
+        only drawn the first time.
+        """
+        if self.map_img is not None:
+            return
         #                   R    G    B
         rgb_value = {'W': (0.0, 0.0, 1.0),  # blue
                      'L': (0.0, 0.6, 0.0),  # dark green
@@ -212,7 +273,7 @@ class Visual:
             self.fig = plt.figure()
             self.map_ax = self.fig.add_subplot(10, 3, (1, 10))
 
-        self.map_ax.imshow(map_rgb)
+        self.map_img = self.map_ax.imshow(map_rgb)
 
         self.map_ax.set_xticks(range(0, len(map_rgb[0]), 2))
         self.map_ax.set_xticklabels(range(1, 1 + len(map_rgb[0]), 2))
@@ -225,20 +286,110 @@ class Visual:
     def update(self, num_years, printed_year, herbs, carns, herb_col, carn_col,
                fit_herb, fit_carns, age_herbs, age_carns, weight_herbs, weight_carns, cmax,
                ymax):
+        self.draw(self.snapshot(num_years, printed_year, herbs, carns, herb_col, carn_col,
+                                fit_herb, fit_carns, age_herbs, age_carns, weight_herbs,
+                                weight_carns, cmax, ymax))
+
+    def snapshot(self, num_years, printed_year, herbs, carns, herb_col, carn_col,
+                 fit_herb, fit_carns, age_herbs, age_carns, weight_herbs, weight_carns, cmax,
+                 ymax):
+        """
+        Collects what is drawn for a year: the number of animals, the density maps and the
+        counts of the histograms, instead of the properties of every animal.
+
+        :return: the snapshot to draw
+        :rtype: dict
+        """
+        return {'num_years': num_years, 'printed_year': printed_year,
+                'herbs': herbs, 'carns': carns,
+                'herb_col': np.array(herb_col), 'carn_col': np.array(carn_col),
+                'hist': {prop: (np.histogram(values_herbs, self.bin_edges(prop))[0],
+                                np.histogram(values_carns, self.bin_edges(prop))[0])
+                         for prop, values_herbs, values_carns in
+                         (('fitness', fit_herb, fit_carns), ('age', age_herbs, age_carns),
+                          ('weight', weight_herbs, weight_carns))},
+                'cmax': dict(cmax), 'ymax': ymax}
+
+    def draw(self, snapshot):
+        """
+        Draws the snapshot of a year.
+
+        :param snapshot: the snapshot from snapshot()
+        :type snapshot: dict
+        """
         self.year += 1
-        self.show_map()
-        self.graph_animals(num_years, herbs, carns, ymax)
-        self.txt.set_text(self.template.format(printed_year))
-        self.update_herb_col(herb_col, cmax['Herbivores'])
-        self.update_carn_col(carn_col, cmax['Carnivores'])
-        self.update_fitness_hist(fit_herb, fit_carns, self.ymax)
-        self.update_age_hist(age_herbs, age_carns, self.ymax)
-        self.update_weight_hist(weight_herbs, weight_carns, self.ymax)
+        limits = self.axis_limits()
+        self.graph_animals(snapshot['num_years'], snapshot['herbs'], snapshot['carns'],
+                           snapshot['ymax'])
+        self.txt.set_text(self.template.format(snapshot['printed_year']))
+        self.update_herb_col(snapshot['herb_col'], snapshot['cmax']['Herbivores'])
+        self.update_carn_col(snapshot['carn_col'], snapshot['cmax']['Carnivores'])
+        hist = snapshot['hist']
+        self.update_hist(self.fitness_hist, self.fitness_step_herb, self.fitness_step_carns,
+                         *hist['fitness'], self.ymax)
+        self.update_hist(self.age_hist, self.age_step_herb, self.age_step_carns,
+                         *hist['age'], self.ymax)
+        self.update_hist(self.weight_hist, self.weight_step_herb, self.weight_step_carns,
+                         *hist['weight'], self.ymax)
+        if self.blit:
+            if self.background is None or limits != self.axis_limits():
+                self.redraw()
+            else:
+                self.blit_artists()
+            return
         self.fig.tight_layout()
         self.fig.canvas.flush_events()
 
         plt.pause(1e-10)
 
+    def dynamic_artists(self):
+        """
+        Finds the artists that change every year.
+
+        :return: the lines, density maps, histogram steps and year text
+        :rtype: list
+        """
+        return [self.line1, self.line2, self.herb_axis, self.carn_axis,
+                self.fitness_step_herb, self.fitness_step_carns, self.age_step_herb,
+                self.age_step_carns, self.weight_step_herb, self.weight_step_carns, self.txt]
+
+    def axis_limits(self):
+        """
+        Collects the y-axis limits that are raised when the numbers grow. The background
+        must be drawn again when they change.
+
+        :return: the limits of the graph and the histograms
+        :rtype: tuple
+        """
+        return tuple(axis.get_ylim() for axis in
+                     (self.graph_ax, self.fitness_hist, self.age_hist, self.weight_hist))
+
+    def redraw(self):
+        """
+        Draws the whole figure without the changing artists, saves it as the background, and
+        draws the changing artists over it.
+        """
+        for artist in self.dynamic_artists():
+            artist.set_animated(True)
+        self.fig.tight_layout()
+        self.fig.canvas.draw()
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self.blit_artists(restore=False)
+
+    def blit_artists(self, restore=True):
+        """
+        Draws the changing artists over the saved background, and shows the result.
+
+        :param restore: If True, the background is restored first
+        :type restore: bool
+        """
+        if restore:
+            self.fig.canvas.restore_region(self.background)
+        for artist in self.dynamic_artists():
+            self.fig.draw_artist(artist)
+        self.fig.canvas.blit(self.fig.bbox)
+        self.fig.canvas.flush_events()
+
     def graph_animals(self, num_years, herbs, carns, ymax):
         if self.line1 is None:
             self.graph_ax.set_xlim(0, num_years)
@@ -268,6 +419,7 @@ class Visual:
             ydata1[self.year - 1] = herbs
             ydata2[self.year - 1] = carns
 
+        ymax = max(ymax, self.graph_ax.get_ylim()[1])
         if herbs > ymax or carns > ymax:
             ymax = max(herbs, carns)*1.2
             self.graph_ax.set_ylim(0, ymax)
@@ -282,8 +434,13 @@ class Visual:
              .. :note:
                  Requires ffmpeg for MP4 and magick for GIF
 
-             The movie is stored as img_base + movie_fmt
+             The movie is stored as img_base + movie_fmt. If the frames were piped to a
+             movie_file, that movie is finished instead.
              """
+        if self.movie_file is not None:
+            self.close_movie()
+            return
+
         _DEFAULT_GRAPHICS_DIR = os.path.join('Results', 'tests')
         _DEFAULT_GRAPHICS_NAME = 'dv'
         _DEFAULT_MOVIE_FORMAT = 'mp4'
@@ -337,7 +494,189 @@ class Visual:
             return
 
     def save_plot(self):
+        if self.movie_writer is not None:
+            self.movie_writer.write_frame(draw=not (self.blit and self.background is not None))
         if self.img_base is not None:
             plt.savefig(os.path.join(self.img_dir, f'{self.img_base}_{self.img_ctr:05d}.'
                                                    f'{self.img_fmt}'))
             self.img_ctr += 1
+
+    def close_movie(self):
+        """
+        Finishes the movie of the movie writer, if any.
+        """
+        if self.movie_writer is not None:
+            writer, self.movie_writer = self.movie_writer, None
+            writer.close()
+
+
+class MovieWriter:
+    """
+    Encodes a movie while the simulation runs. The frames are piped as raw RGBA pixels from
+    the canvas of the figure to a long-lived ffmpeg process, so no image files are written.
+    The canvas must be drawn by Agg, as with the Agg and TkAgg backends.
+    """
+    def __init__(self, fig, path, fps=25, ffmpeg='ffmpeg'):
+        """
+        :param fig: the figure to record
+        :type fig: matplotlib.figure.Figure
+        :param path: the path of the movie, ending in .mp4 or .gif
+        :type path: str
+        :param fps: the number of frames per second
+        :type fps: int
+        :param ffmpeg: the ffmpeg program
+        :type ffmpeg: str
+        :raises ValueError: If the movie format is unknown
+        """
+        self.movie_fmt = os.path.splitext(path)[1][1:].lower()
+        if self.movie_fmt == 'mp4':
+            # Parameters chosen according to http://trac.ffmpeg.org/wiki/Encode/H.264,
+            # section "Compatibility", as in Visual.make_movie
+            self.options = ['-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+                            '-profile:v', 'baseline',
+                            '-level', '3.0',
+                            '-pix_fmt', 'yuv420p']
+        elif self.movie_fmt == 'gif':
+            self.options = []
+        else:
+            raise ValueError('Unknown movie format: ' + self.movie_fmt)
+        self.fig = fig
+        self.path = path
+        self.fps = fps
+        self.ffmpeg = ffmpeg
+        self.process = None
+        self.shape = None
+
+    def start(self, width, height):
+        """
+        Starts ffmpeg for frames of the given size.
+
+        :raises RuntimeError: If ffmpeg can not be started
+        """
+        try:
+            self.process = subprocess.Popen([self.ffmpeg, '-y', '-loglevel', 'error',
+                                             '-f', 'rawvideo',
+                                             '-pix_fmt', 'rgba',
+                                             '-s', f'{width}x{height}',
+                                             '-r', str(self.fps),
+                                             '-i', '-'] + self.options + [self.path],
+                                            stdin=subprocess.PIPE)
+        except OSError as err:
+            raise RuntimeError('ERROR: ffmpeg could not be started: {}'.format(err))
+
+    def write_frame(self, draw=True):
+        """
+        Sends the pixels of the canvas to ffmpeg. It is started with the size of the first
+        frame.
+
+        :param draw: If True, the canvas is drawn first; if False, it must already show the
+                     frame, e.g. after blitting
+        :type draw: bool
+        :raises RuntimeError: If ffmpeg has stopped
+        :raises ValueError: If the size of the figure has changed
+        """
+        if draw:
+            self.fig.canvas.draw()
+        frame = np.asarray(self.fig.canvas.buffer_rgba())
+        if self.process is None:
+            self.shape = frame.shape
+            self.start(frame.shape[1], frame.shape[0])
+        elif frame.shape != self.shape:
+            raise ValueError('The size of the figure has changed')
+        try:
+            self.process.stdin.write(frame.tobytes())
+        except BrokenPipeError as err:
+            raise RuntimeError('ERROR: ffmpeg failed with: {}'.format(err))
+
+    def close(self):
+        """
+        Ends the stream of frames, and waits until ffmpeg has written the movie.
+
+        :raises RuntimeError: If ffmpeg failed
+        """
+        if self.process is None:
+            return
+        process, self.process = self.process, None
+        process.stdin.close()
+        if process.wait() != 0:
+            raise RuntimeError('ERROR: ffmpeg failed with exit code {}'.format(
+                process.returncode))
+
+
+class Renderer:
+    """
+    Draws and saves the graphics of a Visual in a separate thread. The simulation puts the
+    calls, e.g. the snapshot of every visualized year, in a bounded queue, and only waits
+    when the queue is full. It should be used with a non-interactive backend such as Agg.
+    """
+    def __init__(self, visual, queue_size=10):
+        """
+        :param visual: the graphics to draw
+        :type visual: Visual
+        :param queue_size: the number of calls that can wait in the queue
+        :type queue_size: int
+        :raises ValueError: If the matplotlib backend draws in a window
+        """
+        if interactive_backend():
+            raise ValueError('The renderer thread needs a non-interactive backend, e.g. Agg')
+        self.visual = visual
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.error = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, method, *args):
+        """
+        Puts a call to a method of the visual in the queue, and waits if the queue is full.
+
+        :param method: the name of the method, e.g. 'draw'
+        :type method: str
+        :raises Exception: the first error of the renderer thread
+        """
+        self.raise_error()
+        self.queue.put((method, args))
+
+    def run(self):
+        """
+        Calls the methods in the queue until it gets None. After an error, the rest of the
+        calls are skipped.
+        """
+        while True:
+            method, args = self.queue.get()
+            try:
+                if method is None:
+                    return
+                if self.error is None:
+                    getattr(self.visual, method)(*args)
+            except Exception as error:
+                self.error = error
+            finally:
+                self.queue.task_done()
+
+    def raise_error(self):
+        """
+        Raises the first error of the renderer thread, if any.
+        """
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def wait(self):
+        """
+        Waits until all calls in the queue are done.
+
+        :raises Exception: the first error of the renderer thread
+        """
+        self.queue.join()
+        self.raise_error()
+
+    def close(self):
+        """
+        Finishes the calls in the queue and stops the thread.
+
+        :raises Exception: the first error of the renderer thread
+        """
+        if self.thread.is_alive():
+            self.queue.put((None, ()))
+            self.thread.join()
+        self.raise_error()
@@ -0,0 +1,15 @@
+import pytest
+from biosim.animals import Herbivore, Carnivore
+"""
+This file has the fixtures that are shared by the tests
+"""
+
+
+@pytest.fixture(autouse=True)
+def reset_params():
+    """
+    Resets the parameters after every test
+    """
+    yield
+    Herbivore.set_params(Herbivore.default_params)
+    Carnivore.set_params(Carnivore.default_params)
@@ -1,3 +1,4 @@
+import math
 import pytest
 from biosim.animals import Herbivore, Carnivore
 """
@@ -37,6 +38,89 @@ def test_migrate(class_to_test, mocker):
     assert ani.migrate()
 
 
+@pytest.mark.parametrize('class_to_test', [Herbivore, Carnivore])
+def test_fitness_array(class_to_test):
+    """
+    Checking that the batched fitness gives the same values as single animals
+    """
+    animals = [class_to_test(weight, age) for weight, age in [(20, 5), (3, 60), (0, 2)]]
+    fitness = class_to_test.fitness_array([ani.age for ani in animals],
+                                          [ani.weight for ani in animals])
+    assert list(fitness) == [ani.fitness for ani in animals]
+
+
+@pytest.mark.parametrize('class_to_test', [Herbivore, Carnivore])
+def test_update_fitness_batch(class_to_test):
+    """
+    Checking that only animals with fitness_update set are recalculated in a batch
+    """
+    animals = [class_to_test(20, 5) for _ in range(100)]
+    animals[0].eat(10)
+    animals[1].weight = 50
+    for ani in animals[2:]:
+        ani.update_age()
+    class_to_test.update_fitness_batch(animals)
+    assert animals[0].fitness == class_to_test(20 + animals[0].beta * 10, 5).fitness
+    assert animals[1].fitness == class_to_test(20, 5).fitness
+    assert not (animals[0].fitness_update or animals[1].fitness_update)
+
+
+@pytest.mark.parametrize('class_to_test', [Herbivore, Carnivore])
+def test_update_fitness_batch_exact(class_to_test):
+    """
+    Checking that the fitness of an animal does not depend on how many animals are updated
+    with it
+    """
+    animals = [class_to_test(5 + 0.013 * num, num % 30) for num in range(1000)]
+    single = []
+    for ani in animals:
+        ani.eat(3)
+        single.append(class_to_test(ani.weight, ani.age).fitness)
+    class_to_test.update_fitness_batch(animals)
+    assert [ani.fitness for ani in animals] == single
+    assert class_to_test.fitness_array([ani.age for ani in animals],
+                                       [ani.weight for ani in animals]).tolist() == single
+
+
+@pytest.mark.parametrize('class_to_test', [Herbivore, Carnivore])
+def test_age_table(class_to_test):
+    """
+    Checking that the table of age factors follows the parameters, and is extended for
+    animals older than the table
+    """
+    class_to_test.set_params({'phi_age': 0.3, 'a_half': 30})
+    assert class_to_test.age_table[30] == 0.5
+    ani = class_to_test(20, len(class_to_test.age_table) + 10)
+    assert ani.fitness == pytest.approx(
+        (1 / (1 + math.exp(0.3 * (ani.age - 30)))) *
+        (1 / (1 + math.exp(-ani.phi_weight * (20 - ani.w_half)))))
+    assert len(class_to_test.age_table) > ani.age
+    class_to_test.set_params(class_to_test.default_params)
+
+
+@pytest.mark.parametrize('class_to_test', [Herbivore, Carnivore])
+def test_age_table_negative_age(class_to_test):
+    """
+    Checking that a negative age is not looked up from the end of the table
+    """
+    ani = class_to_test(20, -2)
+    fitness = (1 / (1 + math.exp(ani.phi_age * (-2 - ani.a_half)))) * \
+        (1 / (1 + math.exp(-ani.phi_weight * (20 - ani.w_half))))
+    assert ani.fitness == pytest.approx(fitness)
+    assert class_to_test.fitness_array([-2, 5], [20, 20])[0] == ani.fitness
+
+
+@pytest.mark.parametrize('class_to_test', [Herbivore, Carnivore])
+def test_age_not_whole_number(class_to_test):
+    """
+    Checking that an age that is not a whole number is calculated with the formula
+    """
+    ani = class_to_test(20, 5.5)
+    fitness = (1 / (1 + math.exp(ani.phi_age * (5.5 - ani.a_half)))) * \
+        (1 / (1 + math.exp(-ani.phi_weight * (20 - ani.w_half))))
+    assert ani.fitness == pytest.approx(fitness)
+
+
 class Test_herbivore:
     """
     A class for testing the Herbivore-class.
@@ -81,8 +165,7 @@ class Test_herbivore:
         Since the weight of the "mother" in this instance is so low (10), it should always return 0.
         """
         num_herb = 100
-        self.ani.herb_birth(num_herb)
-        assert self.ani.prob == 0
+        assert self.ani.birth_probability(num_herb) == 0
 
     def test_birth2(self):
         """
@@ -95,8 +178,7 @@ class Test_herbivore:
         xi = 1.2
         num_herb = 100
         ani = Herbivore(100, 5)
-        ani.herb_birth(num_herb)
-        assert ani.prob == 1
+        assert ani.birth_probability(num_herb) == 1
 
 
 class Test_Guaranteed_birth:
@@ -197,7 +279,7 @@ class Test_carnivores:
         """
         testing if the weight of a carnivore updates as it should.
         """
-        self.ani.zeta = zeta
+        self.ani.set_params({'zeta': zeta})
         weight0 = self.ani.weight
         mocker.patch('random.random', return_value=0)
         mocker.patch('random.gauss', return_value=1)
@@ -218,3 +300,18 @@ class Test_carnivores:
         """
         self.ani.weight = 0
         assert self.ani.death()
+
+
+@pytest.mark.parametrize('class_to_test', [Herbivore, Carnivore])
+def test_slots(class_to_test):
+    """
+    Checking that the animals only have their fixed attributes
+    """
+    ani = class_to_test(20, 5)
+    if class_to_test is Herbivore:
+        ani.herb_birth(10)
+    else:
+        ani.carn_birth(10)
+    assert not hasattr(ani, '__dict__')
+    with pytest.raises(AttributeError):
+        ani.prob = 1
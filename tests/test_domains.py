@@ -0,0 +1,102 @@
+import pytest
+from biosim.domains import split, BlockIsland, DomainIsland
+from biosim.simulation import BioSim
+from biosim.animals import Herbivore
+"""
+This file tests the islands that are split into blocks
+"""
+
+ISLAND_MAP = "WWWWWW\nWLHLDW\nWDLLHW\nWLLHLW\nWWWWWW"
+
+INI_POP = [{'loc': (2, 2),
+            'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(30)] +
+                   [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(8)]},
+           {'loc': (4, 5),
+            'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(20)]}]
+
+
+def test_split():
+    """
+    Testing that the rows are split into parts of nearly equal size
+    """
+    assert split(5, 2) == [0, 2, 5]
+    assert split(6, 3) == [0, 2, 4, 6]
+
+
+def test_block_halo():
+    """
+    Testing that the block owns the tiles inside its halo, numbered as on the whole island
+    """
+    block = BlockIsland(['WWWW', 'WLHW', 'WWWW'], 1, 1, 6, seed=1)
+    assert len(block.halo) == 10
+    assert [block.index[loc] for loc in block.owned] == [7, 8]
+
+
+def test_blocks_same_as_serial():
+    """
+    Testing that the results do not depend on the number of blocks
+    """
+    states = []
+    for options in ({'workers': 1}, {'blocks': (2, 1)}, {'blocks': (2, 3)}):
+        sim = BioSim(island_map=ISLAND_MAP, ini_pop=INI_POP, seed=4, vis_years=0, **options)
+        sim.simulate(10)
+        states.append((sim.num_animals_per_species, sim.island.get_state(),
+                       sim.island.density()))
+        sim.close()
+    for num_animals, state, density in states[1:]:
+        assert num_animals == states[0][0]
+        assert all((state[key] == states[0][1][key]).all() for key in state)
+        assert density == states[0][2]
+
+
+def test_blocks_checkpoint(tmp_path):
+    """
+    Testing that a checkpoint of an island in blocks can be resumed without blocks
+    """
+    path = tmp_path / 'checkpoint.npz'
+    sim = BioSim(island_map=ISLAND_MAP, ini_pop=INI_POP, seed=4, vis_years=0, blocks=(2, 2))
+    sim.simulate(5)
+    sim.save_checkpoint(path)
+    sim.simulate(5)
+    state = sim.island.get_state()
+    sim.close()
+    resumed = BioSim.load_checkpoint(path, vis_years=0)
+    resumed.simulate(5)
+    assert resumed.num_animals_per_species == sim.num_animals_per_species
+    assert all((resumed.island.get_state()[key] == state[key]).all() for key in state)
+
+
+def test_blocks_water():
+    """
+    Testing that animals can not be placed in water
+    """
+    island = DomainIsland(ISLAND_MAP, seed=1, blocks=(1, 2))
+    with pytest.raises(ValueError):
+        island.add_animals([INI_POP[1], {'loc': (1, 1), 'pop': INI_POP[0]['pop']}])
+    assert island.num_animals_per_species() == {'Herbivore': 0, 'Carnivore': 0}
+    assert island.density()['Herbivore'][3][4] == 0
+    island.close()
+
+
+def test_blocks_arrays_backend():
+    """
+    Testing that blocks can not be used with the array backend
+    """
+    with pytest.raises(ValueError):
+        BioSim(island_map=ISLAND_MAP, ini_pop=INI_POP, seed=1, vis_years=0, backend='arrays',
+               blocks=(2, 2))
+
+
+def test_blocks_current_parameters():
+    """
+    Testing that the animals added to the blocks are made with the current parameters
+    """
+    fitness = []
+    for options in ({'workers': 1}, {'blocks': (2, 2)}):
+        Herbivore.set_params(Herbivore.default_params)
+        sim = BioSim(island_map=ISLAND_MAP, ini_pop=[], seed=4, vis_years=0, **options)
+        BioSim.set_animal_parameters('Herbivore', {'w_half': 30, 'phi_age': 0.9, 'a_half': 3})
+        sim.add_population(INI_POP)
+        fitness.append(sim.island.animal_properties()['Herbivore']['fitness'])
+        sim.close()
+    assert fitness[0] == fitness[1]
@@ -1,4 +1,4 @@
-from src.biosim.island import Island
+from src.biosim.island import Island, Tile
 from src.biosim.animals import Herbivore, Carnivore
 import pytest
 import textwrap
@@ -28,6 +28,7 @@ class TestingIslandTile:
         self.tiles = self.isla.tiles
         self.chart[2][2].herbs = herbs
         self.chart[2][2].carns = carns
+        self.isla.mark_occupied(self.chart[2][2])
 
     def testing_migration(self, mocker):
         """
@@ -48,6 +49,19 @@ class TestingIslandTile:
         self.isla.migration()
         assert not self.chart[3][2].new_h and self.chart[3][2].herbs
 
+    def testing_migration_remove(self, mocker):
+        """
+        Testing that the migrants leave the tile, and that the animals that stay keep their order.
+        Every second herbivore migrates.
+        """
+        mocker.patch('random.random', side_effect=[0, 0, 1] * 25)
+        tile = self.chart[2][2]
+        staying = tile.herbs[1::2]
+        tile.carns = []
+        tile.animals_migrate()
+        assert tile.herbs == staying and not tile.mig_h
+        assert len(self.chart[3][2].new_h) == 25
+
     def testing_tile_loc(self):
         """
         Testing if the loc.location() works as intended.
@@ -80,6 +94,19 @@ class TestingIslandTile:
         self.isla.feeding()
         assert not tile.herbs and weight0 < tile.carns[0].weight
 
+    def testing_tile_hunting(self, mocker):
+        """
+        Tests that each carnivore keeps killing until it has eaten at least F (50), and that the
+        surviving herbivores are left in increasing order of fitness. Each carnivore eats three
+        herbivores (63 and 75 in total) and kills a fourth before it stops.
+        """
+        mocker.patch('random.random', return_value=0)
+        tile = self.chart[2][2]
+        tile.herbs = [Herbivore(20 + num, 5) for num in range(10)]
+        tile.carns = [Carnivore(20, 5), Carnivore(20, 5)]
+        tile.feed_carns()
+        assert [herb.weight for herb in tile.herbs] == [28, 29]
+
     def testing_tile_age(self):
         """
         Tests whether the animals age at the expected rate.
@@ -99,6 +126,18 @@ class TestingIslandTile:
         self.isla.death()
         assert not (tile.herbs or tile.carns)
 
+    def testing_fused_aging_weight_loss(self):
+        """
+        Checks that the fused end-of-year stage gives the same ages and weights as aging
+        followed by weight-loss
+        """
+        tile = self.chart[2][2]
+        expected = [(ani.age + 1, ani.weight - ani.eta * ani.weight)
+                    for ani in tile.herbs + tile.carns]
+        self.isla.aging_and_loss_of_weight()
+        assert [(ani.age, ani.weight) for ani in tile.herbs + tile.carns] == expected
+        assert all(ani.fitness_update for ani in tile.herbs + tile.carns)
+
     def testing_tile_weightloss(self):
         """
         Checks that the weight-loss function works correctly
@@ -157,3 +196,112 @@ def testing_add_animals2():
                                    {'species': 'Carnivore',
                                     'age': 5,
                                     'weight': 20}]}])
+
+
+def testing_island_counters():
+    """
+    Testing that every island counts its own animals, and that the counts follow births,
+    kills, migration and deaths
+    """
+    geogr = textwrap.dedent("""\
+                            WWWWW
+                            WLLLW
+                            WHDHW
+                            WWWWW""")
+    animals = [{'loc': (2, 3),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(40)] +
+                       [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(10)]}]
+    first = Island(geogr)
+    second = Island(geogr)
+    first.add_animals(animals)
+    assert first.num_animals_per_species() == {'Herbivore': 40, 'Carnivore': 10}
+    assert second.num_animals_per_species() == {'Herbivore': 0, 'Carnivore': 0}
+    for _ in range(10):
+        first.yearly_cycle()
+        density = first.density()
+        assert first.num_animals_per_species() == {
+            species: sum(map(sum, density[species])) for species in density}
+
+
+def testing_occupied_tiles():
+    """
+    Testing that the index of occupied tiles follows the animals, in the order of the tiles,
+    and that the animals on empty tiles are not visited
+    """
+    geogr = textwrap.dedent("""\
+                            WWWWWW
+                            WLLLLW
+                            WLLLLW
+                            WWWWWW""")
+    isla = Island(geogr)
+    isla.add_animals([{'loc': (2, 3),
+                       'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                               for _ in range(40)]}])
+    assert isla.occupied == [isla.map[1][2]]
+    for _ in range(5):
+        isla.yearly_cycle()
+        assert isla.occupied == [loc for loc in isla.tiles if loc.herbs or loc.carns]
+    assert all(not loc.new_h for loc in isla.tiles)
+
+
+def testing_neighbour_table():
+    """
+    Testing that every tile knows its traversable neighbours below, above, right and left
+    """
+    isla = Island(textwrap.dedent("""\
+                                  WWWW
+                                  WLHW
+                                  WDWW
+                                  WWWW"""))
+    chart = isla.map
+    assert chart[1][1].neighbours == (chart[2][1], None, chart[1][2], None)
+    assert chart[1][2].neighbours == (None, None, None, chart[1][1])
+    assert chart[0][0].neighbours == (None, None, None, None)
+
+
+def testing_workers_need_tile_streams():
+    """
+    Testing that worker threads can only be used when every tile has its own generator
+    """
+    isla = Island(textwrap.dedent("""\
+                                  WWWW
+                                  WLLW
+                                  WWWW"""))
+    with pytest.raises(ValueError):
+        isla.use_workers(2)
+    isla.use_tile_streams(1)
+    isla.use_workers(2)
+    assert isla.map_tiles(Tile.animals_dead) == []
+    isla.use_workers(1)
+
+
+def testing_occupied_direct_placement():
+    """
+    Testing that animals placed directly on a tile are found by the yearly cycle once the
+    tile is marked as occupied
+    """
+    isla = Island("WWW\nWLW\nWWW")
+    isla.yearly_cycle()
+    isla.map[1][1].herbs = [Herbivore(20, 5) for _ in range(10)]
+    isla.mark_occupied(isla.map[1][1])
+    isla.yearly_cycle()
+    assert isla.occupied == [isla.map[1][1]]
+    assert any(herb.age == 6 for herb in isla.map[1][1].herbs)
+
+
+def testing_counts_direct_placement():
+    """
+    Testing that the animals placed directly on an occupied tile are counted, and that the
+    counts follow them through the yearly cycle
+    """
+    isla = Island("WWWW\nWLLW\nWWWW")
+    isla.add_animals([{'loc': (2, 2),
+                       'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                               for _ in range(10)]}])
+    isla.map[1][1].herbs += [Herbivore(20, 5) for _ in range(10)]
+    assert isla.num_animals_per_species() == {'Herbivore': 20, 'Carnivore': 0}
+    for _ in range(5):
+        isla.yearly_cycle()
+        density = isla.density()
+        assert isla.num_animals_per_species() == {
+            species: sum(map(sum, density[species])) for species in density}
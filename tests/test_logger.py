@@ -0,0 +1,128 @@
+import csv
+import pytest
+import textwrap
+from biosim.logger import LogWriter
+from biosim.simulation import BioSim
+"""
+This file tests the log writer of the simulation
+"""
+
+GEOGR = textwrap.dedent("""\
+                        WWWWW
+                        WLHDW
+                        WWWWW""")
+
+INI_POP = [{'loc': (2, 2),
+            'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(40)] +
+                   [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(10)]}]
+
+
+def read_log(path):
+    """
+    Reads all rows of a log file
+    """
+    with open(path, newline='') as f:
+        return list(csv.reader(f))
+
+
+def test_log_buffered(tmp_path):
+    """
+    Checking that the rows are kept until the buffer is full
+    """
+    path = tmp_path / 'log.csv'
+    log = LogWriter(path, ['Year', 'Herbivores'], buffer_rows=3, flush_seconds=1000)
+    log.write([0, 10])
+    log.write([1, 12])
+    assert read_log(path) == [['Year', 'Herbivores']]
+    log.write([2, 14])
+    assert read_log(path)[1:] == [['0', '10'], ['1', '12'], ['2', '14']]
+    log.close()
+
+
+def test_log_flush_time(tmp_path):
+    """
+    Checking that the rows are written when they have been kept for too long
+    """
+    path = tmp_path / 'log.csv'
+    log = LogWriter(path, ['Year'], buffer_rows=100, flush_seconds=0)
+    log.write([0])
+    assert read_log(path) == [['Year'], ['0']]
+    log.close()
+
+
+def test_log_close(tmp_path):
+    """
+    Checking that the rest of the rows are written when the log is closed
+    """
+    path = tmp_path / 'log.csv'
+    log = LogWriter(path, ['Year'], buffer_rows=100, flush_seconds=1000)
+    log.write([0])
+    log.close()
+    log.close()
+    assert read_log(path) == [['Year'], ['0']]
+
+
+def test_biosim_log(tmp_path, monkeypatch):
+    """
+    Checking that BioSim logs one row per year, and that all rows are written when
+    simulate returns
+    """
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'Results').mkdir()
+    sim = BioSim(GEOGR, INI_POP, seed=1, vis_years=0, log_file='log.csv')
+    sim.simulate(3)
+    rows = read_log(tmp_path / 'Results' / 'log.csv')
+    assert rows[0] == ['Year', 'Herbivores', 'Carnivores']
+    assert [row[0] for row in rows[1:]] == ['1', '2', '3']
+    assert rows[-1][1:] == [str(sim.num_animals_per_species['Herbivore']),
+                            str(sim.num_animals_per_species['Carnivore'])]
+    sim.close()
+
+
+def test_biosim_log_detail(tmp_path, monkeypatch):
+    """
+    Checking that the detailed log adds up to the number of animals for both backends
+    """
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'Results').mkdir()
+    for backend in ('objects', 'arrays'):
+        sim = BioSim(GEOGR, INI_POP, seed=1, vis_years=0, log_file=f'{backend}.csv',
+                     log_detail=True, backend=backend)
+        sim.simulate(2)
+        sim.close()
+        header, *rows = read_log(tmp_path / 'Results' / f'{backend}.csv')
+        assert len(header) == 11 and len(rows) == 2
+        row = rows[-1]
+        assert int(row[1]) == sum(int(value) for value in row[3:6])
+        assert int(row[2]) == sum(int(value) for value in row[6:9])
+
+
+def test_log_with_statement(tmp_path):
+    """
+    Checking that the log is written and closed at the end of a with statement
+    """
+    path = tmp_path / 'log.csv'
+    with LogWriter(path, ['Year'], buffer_rows=100, flush_seconds=1000) as log:
+        log.write([0])
+    assert log.file.closed
+    assert read_log(path) == [['Year'], ['0']]
+
+
+def test_biosim_log_error(tmp_path, monkeypatch):
+    """
+    Checking that the years before an error are written, and that the with statement
+    closes the log file
+    """
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'Results').mkdir()
+
+    def observer(year, statistics):
+        if year == 3:
+            raise RuntimeError
+
+    with pytest.raises(RuntimeError):
+        with BioSim(GEOGR, INI_POP, seed=1, vis_years=0, log_file='log.csv') as sim:
+            sim.add_observer(observer)
+            sim.simulate(5)
+    assert sim.log.file.closed
+    assert [row[0] for row in read_log(tmp_path / 'Results' / 'log.csv')[1:]] == ['1', '2']
@@ -0,0 +1,247 @@
+import copy
+import pytest
+import textwrap
+import numpy as np
+from biosim.population import Population, ArrayIsland
+from biosim.animals import Herbivore, Carnivore
+from biosim.landscape import Lowland, Desert
+from biosim.island import Tile
+from biosim.simulation import BioSim
+"""
+This file tests the structure-of-arrays population backend
+"""
+
+
+def test_population_fitness():
+    """
+    Checking that the fitness of the population matches the fitness of single animals
+    """
+    pop = Population(Herbivore)
+    pop.add([0, 0, 1], [5, 10, 0], [20, 10, 0])
+    assert len(pop) == 3
+    assert pop.fitness.tolist() == [Herbivore(20, 5).fitness, Herbivore(10, 10).fitness, 0]
+
+
+def test_population_stale():
+    """
+    Checking that only the animals marked as stale get their fitness recalculated
+    """
+    pop = Population(Herbivore)
+    pop.add([0, 0], [5, 5], [20, 20])
+    pop.weight[:] = 40
+    pop.stale[1] = True
+    pop.update_fitness()
+    assert pop.fitness[0] == Herbivore(20, 5).fitness
+    assert pop.fitness[1] == Herbivore(40, 5).fitness
+    assert not pop.stale.any()
+
+
+def test_population_groups():
+    """
+    Checking that the animals are grouped by tile, with the order within a tile kept
+    """
+    pop = Population(Carnivore)
+    pop.add([3, 1, 3, 1], [1, 2, 3, 4], [10, 10, 10, 10])
+    groups = pop.groups()
+    assert [(tile, stop - start) for tile, start, stop in groups] == [(1, 2), (3, 2)]
+    assert list(pop.age) == [2, 4, 1, 3]
+
+
+class TestArrayIsland:
+    """
+    A class for testing the ArrayIsland class.
+    """
+    @pytest.fixture(autouse=True)
+    def island(self):
+        """
+        Creates an island with animals in the centre to be used for tests.
+        """
+        geogr = """\
+                WWWWW
+                WLLLW
+                WHHHW
+                WDDDW
+                WWWWW
+                """
+        self.isla = ArrayIsland(textwrap.dedent(geogr), rng=np.random.default_rng(1))
+        self.isla.add_animals([{'loc': (3, 3),
+                                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                                        for _ in range(50)] +
+                                       [{'species': 'Carnivore', 'age': 5, 'weight': 20}
+                                        for _ in range(20)]}])
+
+    def test_add_animals(self):
+        """
+        Testing that the animals are counted per species
+        """
+        assert self.isla.num_animals_per_species() == {'Herbivore': 50, 'Carnivore': 20}
+        assert self.isla.density()['Herbivore'][2, 2] == 50
+
+    def test_add_animals_water(self):
+        """
+        Testing that animals can not be placed in the water
+        """
+        with pytest.raises(ValueError):
+            self.isla.add_animals([{'loc': (1, 1),
+                                    'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}]}])
+
+    def test_invalid_map(self):
+        """
+        Testing that an invalid map raises a ValueError
+        """
+        with pytest.raises(ValueError):
+            ArrayIsland("WWW\nWRW\nWWW")
+
+    def test_feeding_fodder(self):
+        """
+        Testing that the herbivores eat in descending order of fitness until the fodder is gone
+        """
+        isla = ArrayIsland("WWW\nWLW\nWWW", rng=np.random.default_rng(1))
+        isla.add_animals([{'loc': (2, 2),
+                           'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 10 + i}
+                                   for i in range(200)]}])
+        weight0 = isla.herbs.weight.sum()
+        isla.feeding()
+        assert isla.herbs.weight.sum() == pytest.approx(weight0 + Herbivore.beta * Lowland.f_max)
+        assert isla.herbs.weight[np.argmax(isla.herbs.fitness)] > 10 + 199
+
+    def test_hunting(self):
+        """
+        Testing that carnivores that are much fitter than the herbivores kill them
+        """
+        Carnivore.set_params({'DeltaPhiMax': 1e-6})
+        isla = ArrayIsland("WWW\nWDW\nWWW", rng=np.random.default_rng(1))
+        isla.add_animals([{'loc': (2, 2),
+                           'pop': [{'species': 'Herbivore', 'age': 100, 'weight': 5},
+                                   {'species': 'Carnivore', 'age': 5, 'weight': 20}]}])
+        weight0 = isla.carns.weight[0]
+        isla.feeding()
+        assert len(isla.herbs) == 0 and isla.carns.weight[0] > weight0
+
+    def test_hunting_same_as_tile(self):
+        """
+        Testing that the carnivores gain the same weight and fitness as on a tile of the
+        object backend, when every kill is certain
+        """
+        Carnivore.set_params({'DeltaPhiMax': 1e-6})
+        isla = ArrayIsland("WWW\nWDW\nWWW", rng=np.random.default_rng(1))
+        isla.add_animals([{'loc': (2, 2),
+                           'pop': [{'species': 'Herbivore', 'age': 100, 'weight': 5 + i}
+                                   for i in range(20)] +
+                                  [{'species': 'Carnivore', 'age': 5, 'weight': 20}]}])
+        tile = Tile(Desert, (2, 2), herbs=[Herbivore(5 + i, 100) for i in range(20)],
+                    carns=[Carnivore(20, 5)])
+        isla.feeding()
+        tile.feed_carns()
+        assert len(isla.herbs) == len(tile.herbs)
+        assert isla.carns.weight[0] == tile.carns[0].weight
+        assert isla.carns.fitness[0] == tile.carns[0].fitness
+
+    def test_procreation(self):
+        """
+        Testing that heavy animals give birth to newborns of age 0
+        """
+        self.isla.herbs.weight[:] = 100
+        self.isla.herbs.stale[:] = True
+        self.isla.procreation()
+        assert len(self.isla.herbs) > 50 and 0 in self.isla.herbs.age
+
+    def test_procreation_counts(self):
+        """
+        Testing that the birth probability depends on the animals on the tile before the
+        births, so a single animal gets no young and each of two animals gets exactly one
+        """
+        Herbivore.set_params({'gamma': 100, 'sigma_birth': 0})
+        isla = ArrayIsland("WWWWW\nWLWLW\nWWWWW", rng=np.random.default_rng(1))
+        isla.add_animals([{'loc': (2, 2), 'pop': [{'species': 'Herbivore', 'age': 5,
+                                                   'weight': 100}]},
+                          {'loc': (2, 4), 'pop': [{'species': 'Herbivore', 'age': 5,
+                                                   'weight': 100} for _ in range(2)]}])
+        isla.procreation()
+        assert list(isla.density()['Herbivore'][1]) == [0, 1, 0, 4, 0]
+
+    def test_migration(self):
+        """
+        Testing that all animals move to a neighbouring tile when they always migrate
+        """
+        Herbivore.set_params({'mu': 100})
+        self.isla.herbs.fitness[:] = 1
+        self.isla.migration()
+        density = self.isla.density()['Herbivore']
+        assert density[2, 2] == 0 and density.sum() == 50
+        assert density[1, 2] + density[3, 2] + density[2, 1] + density[2, 3] == 50
+
+    def test_aging_weight_loss(self):
+        """
+        Testing that the animals get older and lighter
+        """
+        self.isla.aging()
+        self.isla.loss_of_weight()
+        assert all(self.isla.carns.age == 6)
+        assert all(self.isla.carns.weight == 20 - Carnivore.eta * 20)
+
+    def test_fused_aging_weight_loss(self):
+        """
+        Testing that the fused end-of-year stage gives the same ages, weights and fitness as
+        aging followed by weight-loss
+        """
+        self.isla.herbs.weight[:] = np.linspace(5, 50, 50)
+        other = copy.deepcopy(self.isla)
+        self.isla.aging()
+        self.isla.loss_of_weight()
+        other.aging_and_loss_of_weight()
+        other.herbs.update_fitness()
+        assert all((self.isla.herbs.age == other.herbs.age) &
+                   (self.isla.herbs.weight == other.herbs.weight) &
+                   (self.isla.herbs.fitness == other.herbs.fitness))
+
+    def test_death(self):
+        """
+        Testing that animals without weight die
+        """
+        self.isla.herbs.weight[:] = 0
+        self.isla.herbs.stale[:] = True
+        self.isla.death()
+        assert len(self.isla.herbs) == 0
+
+    def test_death_survivors(self):
+        """
+        Testing that only the animals that die are removed, and the survivors keep their order
+        """
+        Carnivore.set_params({'omega': 0})
+        self.isla.carns.weight[:] = np.arange(20) + 1
+        self.isla.carns.weight[::2] = 0
+        self.isla.carns.stale[:] = True
+        self.isla.death()
+        assert list(self.isla.carns.weight) == list(np.arange(2, 21, 2))
+
+
+def test_biosim_arrays_backend():
+    """
+    Testing that BioSim can be run with the array backend
+    """
+    sim = BioSim(island_map="WWWW\nWLHW\nWWWW",
+                 ini_pop=[{'loc': (2, 2),
+                           'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                                   for _ in range(50)]}],
+                 seed=1, vis_years=0, backend='arrays')
+    assert sim.num_animals_per_species == {'Herbivore': 50, 'Carnivore': 0}
+    sim.simulate(5)
+    assert sim.num_animals == sim.num_animals_per_species['Herbivore'] > 0
+
+
+def test_biosim_unknown_backend():
+    """
+    Testing that an unknown backend raises a ValueError
+    """
+    with pytest.raises(ValueError):
+        BioSim(island_map="WWW\nWLW\nWWW", ini_pop=[], seed=1, vis_years=0, backend='gpu')
+
+
+def test_destination_table():
+    """
+    Testing that the destination table only leads to traversable tiles on the map
+    """
+    isla = ArrayIsland("WWWW\nWLHW\nWDWW\nWWWW")
+    assert list(isla.destinations[5]) == [9, -1, 6, -1]
+    assert list(isla.destinations[0]) == [-1, -1, -1, -1]
@@ -0,0 +1,224 @@
+import os
+import subprocess
+import sys
+import pytest
+from biosim.simulation import BioSim
+from biosim.animals import Herbivore
+"""
+This file tests the BioSim class beyond its interface
+"""
+
+ISLAND_MAP = "WWWW\nWLHW\nWWWW"
+
+INI_POP = [{'loc': (2, 2),
+            'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(20)]}]
+
+
+def test_run_replicates():
+    """
+    Testing that replicates give one row of counts per seed, the same as single runs
+    """
+    counts = BioSim.run_replicates(ISLAND_MAP, INI_POP, seeds=[1, 2, 1], num_years=5,
+                                   processes=2)
+    assert counts.shape == (3, 6, 2)
+    assert (counts[0] == counts[2]).all()
+    assert counts[0, 0, 0] == 20
+
+    sim = BioSim(island_map=ISLAND_MAP, ini_pop=INI_POP, seed=2, vis_years=0)
+    sim.simulate(5)
+    assert counts[1, 5, 0] == sim.num_animals_per_species['Herbivore']
+
+
+def test_run_replicates_parameters():
+    """
+    Testing that parameters set before the replicates are used in the workers
+    """
+    BioSim.set_animal_parameters('Herbivore', {'omega': 100})
+    counts = BioSim.run_replicates(ISLAND_MAP, INI_POP, seeds=[1], num_years=1, processes=1)
+    assert counts[0, 1, 0] == 0
+
+
+def test_headless_skips_statistics(mocker):
+    """
+    Testing that no statistics are collected when there are no graphics and no observers
+    """
+    sim = BioSim(island_map=ISLAND_MAP, ini_pop=INI_POP, seed=1, vis_years=0)
+    spy = mocker.spy(sim.island, 'animal_properties')
+    sim.simulate(5)
+    assert spy.call_count == 0
+
+
+def test_observer():
+    """
+    Testing that an observer is given the statistics every given number of years
+    """
+    sim = BioSim(island_map=ISLAND_MAP, ini_pop=INI_POP, seed=1, vis_years=0)
+    calls = []
+    sim.add_observer(lambda year, statistics: calls.append((year, statistics)), years=2)
+    sim.simulate(5)
+    assert [year for year, statistics in calls] == [2, 4]
+    statistics = calls[0][1]
+    num_herbs = statistics['num_animals']['Herbivore']
+    assert len(statistics['properties']['Herbivore']['age']) == num_herbs
+    assert sum(map(sum, statistics['density']['Herbivore'])) == num_herbs
+
+
+@pytest.mark.parametrize('backend', ['objects', 'arrays'])
+def test_checkpoint_resume(tmp_path, backend):
+    """
+    Testing that a simulation loaded from a checkpoint continues exactly as the saved one
+    """
+    ini_pop = INI_POP + [{'loc': (2, 3),
+                          'pop': [{'species': 'Carnivore', 'age': 5, 'weight': 20}
+                                  for _ in range(5)]}]
+    sim = BioSim(island_map=ISLAND_MAP, ini_pop=ini_pop, seed=4, vis_years=0, backend=backend)
+    sim.simulate(5)
+    sim.save_checkpoint(tmp_path / 'checkpoint.npz')
+    sim.simulate(5)
+
+    resumed = BioSim.load_checkpoint(tmp_path / 'checkpoint.npz', vis_years=0)
+    assert resumed.year == 5
+    resumed.simulate(5)
+    assert resumed.num_animals_per_species == sim.num_animals_per_species
+    state, resumed_state = sim.island.get_state(), resumed.island.get_state()
+    assert all((state[key] == resumed_state[key]).all() for key in state)
+
+
+def test_checkpoint_parameters(tmp_path):
+    """
+    Testing that the parameters of the checkpoint are set when it is loaded
+    """
+    BioSim.set_animal_parameters('Herbivore', {'beta': 0.5})
+    BioSim(island_map=ISLAND_MAP, ini_pop=INI_POP, seed=1,
+           vis_years=0).save_checkpoint(tmp_path / 'checkpoint.npz')
+    Herbivore.set_params(Herbivore.default_params)
+    BioSim.load_checkpoint(tmp_path / 'checkpoint.npz', vis_years=0)
+    assert Herbivore.beta == 0.5
+
+
+def test_checkpoint_tile_streams(tmp_path):
+    """
+    Testing that the generators of the tiles are saved in the checkpoint
+    """
+    sim = BioSim(island_map=ISLAND_MAP, ini_pop=INI_POP, seed=1, vis_years=0)
+    sim.island.use_tile_streams(1)
+    sim.simulate(3)
+    sim.save_checkpoint(tmp_path / 'checkpoint.npz')
+    resumed = BioSim.load_checkpoint(tmp_path / 'checkpoint.npz', vis_years=0)
+    assert [loc.rng.random() for loc in resumed.tiles] == [loc.rng.random() for loc in sim.tiles]
+
+
+def test_workers_deterministic():
+    """
+    Testing that the results with tile streams do not depend on the number of worker threads
+    """
+    ini_pop = INI_POP + [{'loc': (2, 3),
+                          'pop': [{'species': 'Carnivore', 'age': 5, 'weight': 20}
+                                  for _ in range(5)]}]
+    states = []
+    for workers in (1, 2, 3):
+        sim = BioSim(island_map="WWWWW\nWLHLW\nWDLLW\nWWWWW", ini_pop=ini_pop, seed=6,
+                     vis_years=0, workers=workers)
+        sim.simulate(10)
+        sim.close()
+        states.append((sim.num_animals_per_species, sim.island.get_state()))
+    for num_animals, state in states[1:]:
+        assert num_animals == states[0][0]
+        assert all((state[key] == states[0][1][key]).all() for key in state)
+
+
+def test_workers_arrays_backend():
+    """
+    Testing that workers can not be used with the array backend
+    """
+    with pytest.raises(ValueError):
+        BioSim(island_map=ISLAND_MAP, ini_pop=INI_POP, seed=1, vis_years=0, backend='arrays',
+               workers=2)
+
+
+@pytest.mark.parametrize('backend', ['objects', 'arrays'])
+def test_fused_aging_optional(backend):
+    """
+    Testing that the yearly cycle gives the same results with and without the fused aging
+    and weight-loss stage
+    """
+    states = []
+    for fused_aging in (True, False):
+        sim = BioSim(island_map=ISLAND_MAP, ini_pop=INI_POP, seed=3, vis_years=0,
+                     backend=backend)
+        sim.island.fused_aging = fused_aging
+        sim.simulate(10)
+        states.append(sim.island.get_state())
+    assert all((states[0][key] == states[1][key]).all() for key in states[0])
+
+
+@pytest.mark.parametrize('options', [{'backend': 'objects'}, {'backend': 'arrays'},
+                                     {'blocks': (1, 2)}])
+def test_log_detail_from_death_pass(tmp_path, monkeypatch, mocker, options):
+    """
+    Testing that the detailed log takes the summary kept by the death pass, which is the
+    same as a summary of the island after the year
+    """
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'Results').mkdir()
+    sim = BioSim(island_map=ISLAND_MAP, ini_pop=INI_POP, seed=3, vis_years=0,
+                 log_file='log.csv', log_detail=True, **options)
+    summary = mocker.spy(sim.island, 'summary')
+    sim.simulate(5)
+    assert summary.call_count == 0
+    assert sim.island.year_summary == sim.island.summary()
+    sim.close()
+
+
+def run_python(code, **env):
+    """
+    Runs Python code in a new interpreter with the same path, and returns what it printed
+    """
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path), **env)
+    for key in [key for key, value in environment.items() if value is None]:
+        del environment[key]
+    return subprocess.run([sys.executable, '-c', code], env=environment, check=True,
+                          capture_output=True, text=True).stdout.strip()
+
+
+def test_import_without_graphics():
+    """
+    Testing that matplotlib is not imported by the simulation unless graphics are used
+    """
+    assert run_python("import sys\n"
+                      "from biosim.simulation import BioSim\n"
+                      f"BioSim({ISLAND_MAP!r}, [], seed=1, vis_years=0).simulate(2)\n"
+                      "print('matplotlib' in sys.modules)") == 'False'
+
+
+def import_time(module):
+    """
+    Measures a cold import of a module in a new interpreter with -X importtime, and returns
+    the cumulative time of the module in microseconds
+    """
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    lines = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                           env=environment, check=True, capture_output=True,
+                           text=True).stderr.splitlines()
+    return [int(line.split('|')[1]) for line in lines
+            if line.startswith('import time:') and line.split('|')[2].strip() == module][0]
+
+
+def test_import_time(record_testsuite_property):
+    """
+    Recording the time of a cold import of the simulation as the import_time_us property of
+    the test suite in the report of --junitxml, so it can be followed from run to run
+    """
+    microseconds = import_time('biosim.simulation')
+    record_testsuite_property('import_time_us', microseconds)
+    assert microseconds > 0
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='the display is set on Linux')
+def test_headless_backend():
+    """
+    Testing that the graphics use a backend without a window when there is no display
+    """
+    assert run_python("import matplotlib, biosim.visuals\n"
+                      "print(matplotlib.get_backend())",
+                      DISPLAY=None, WAYLAND_DISPLAY=None, MPLBACKEND=None).lower() == 'agg'
@@ -0,0 +1,65 @@
+import random
+import textwrap
+import numpy as np
+from biosim.streams import substreams
+from biosim.island import Island
+from biosim.simulation import BioSim
+"""
+This file tests the random number streams of the simulation
+"""
+
+GEOGR = textwrap.dedent("""\
+                        WWWWW
+                        WLLLW
+                        WLHLW
+                        WWWWW""")
+
+INI_POP = [{'loc': (2, 3),
+            'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(40)] +
+                   [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(10)]}]
+
+
+def test_substreams_reproducible():
+    """
+    Checking that the same seed gives the same substreams, and that they differ from each other
+    """
+    first = [rng.random() for rng in substreams(12, 3)]
+    second = [rng.random() for rng in substreams(12, 3)]
+    assert first == second
+    assert len(set(first)) == 3
+
+
+def test_substreams_numpy():
+    """
+    Checking that numpy generators can be derived as substreams
+    """
+    first, second = substreams(12, 2, generator=np.random.default_rng)
+    assert isinstance(first, np.random.Generator)
+    assert first.random() != second.random()
+
+
+def test_tile_streams():
+    """
+    Checking that every tile gets its own generator
+    """
+    isla = Island(GEOGR, rng=random.Random(1))
+    isla.use_tile_streams(1)
+    assert len({id(loc.rng) for loc in isla.tiles}) == len(isla.tiles)
+
+
+def test_independent_simulations():
+    """
+    Checking that two simulations that run interleaved give the same results as when
+    they run one after the other
+    """
+    alone = BioSim(GEOGR, INI_POP, seed=3, vis_years=0)
+    alone.simulate(10)
+    density = alone.island.density()
+
+    first = BioSim(GEOGR, INI_POP, seed=3, vis_years=0)
+    second = BioSim(GEOGR, INI_POP, seed=4, vis_years=0)
+    for _ in range(10):
+        first.simulate(1)
+        random.random()
+        second.simulate(1)
+    assert first.island.density() == density
@@ -0,0 +1,212 @@
+import filecmp
+import pytest
+import matplotlib.pyplot as plt
+from biosim.visuals import Visual, Renderer
+from biosim.simulation import BioSim
+"""
+This file tests the graphics of the simulation
+"""
+
+ISLAND_MAP = "WWWWW\nWLHLW\nWDLLW\nWWWWW"
+
+INI_POP = [{'loc': (2, 2),
+            'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(30)] +
+                   [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(5)]}]
+
+
+@pytest.fixture(autouse=True)
+def close_figures():
+    """
+    Closes the figures made by a test
+    """
+    yield
+    plt.close('all')
+
+
+def test_renderer_order(mocker):
+    """
+    Testing that the renderer calls the methods of the visual in the order they were put
+    """
+    visual = mocker.Mock()
+    renderer = Renderer(visual, queue_size=2)
+    for year in range(5):
+        renderer.submit('draw', year)
+    renderer.submit('save_plot')
+    renderer.wait()
+    renderer.close()
+    assert [call.args for call in visual.draw.call_args_list] == [(year,) for year in range(5)]
+    assert visual.save_plot.call_count == 1
+
+
+def test_renderer_error(mocker):
+    """
+    Testing that an error in the renderer thread is raised in the simulation
+    """
+    visual = mocker.Mock()
+    visual.draw.side_effect = RuntimeError
+    renderer = Renderer(visual)
+    renderer.submit('draw', 1)
+    with pytest.raises(RuntimeError):
+        renderer.wait()
+    renderer.close()
+
+
+def test_renderer_close_error(mocker):
+    """
+    Testing that an error that is still pending is raised when the renderer is closed
+    """
+    visual = mocker.Mock()
+    visual.save_plot.side_effect = RuntimeError
+    renderer = Renderer(visual)
+    renderer.submit('save_plot')
+    with pytest.raises(RuntimeError):
+        renderer.close()
+
+
+def test_renderer_interactive_backend(mocker):
+    """
+    Testing that the renderer thread can not be used with a backend that draws in a window
+    """
+    mocker.patch('biosim.visuals.interactive_backend', return_value=True)
+    with pytest.raises(ValueError):
+        Renderer(mocker.Mock())
+
+
+def test_render_queue_same_images(tmp_path):
+    """
+    Testing that the images saved by the renderer thread are the same as without it
+    """
+    for name, render_queue in (('direct', None), ('queued', 2)):
+        (tmp_path / name).mkdir()
+        sim = BioSim(ISLAND_MAP, INI_POP, seed=1, vis_years=1, img_dir=str(tmp_path / name),
+                     img_base='dv', render_queue=render_queue)
+        sim.simulate(3)
+        sim.close()
+    images = sorted(path.name for path in (tmp_path / 'direct').iterdir())
+    assert len(images) == 3
+    assert images == sorted(path.name for path in (tmp_path / 'queued').iterdir())
+    assert all(filecmp.cmp(tmp_path / 'direct' / image, tmp_path / 'queued' / image,
+                           shallow=False) for image in images)
+
+
+def make_snapshot(visual, herbs=30):
+    """
+    Makes the snapshot of a year with the given number of herbivores
+    """
+    return visual.snapshot(3, 1, herbs, 5, [[0] * 5] * 4, [[0] * 5] * 4, [0.5], [0.5], [5],
+                           [5], [20], [20], {'Herbivores': 50, 'Carnivores': 20}, 100)
+
+
+def test_map_drawn_once():
+    """
+    Testing that the island map and its legend are drawn once, and not again every year
+    """
+    visual = Visual(ISLAND_MAP, img_step=1, step=1, ymax=100)
+    visual.setup(0, 3)
+    snapshot = make_snapshot(visual)
+    visual.draw(snapshot)
+    num_axes = len(visual.fig.axes)
+    visual.draw(snapshot)
+    visual.draw(snapshot)
+    assert len(visual.map_ax.images) == 1
+    assert len(visual.fig.axes) == num_axes
+
+
+def test_blit(mocker):
+    """
+    Testing that with blit the figure is only drawn in full when the axes change
+    """
+    visual = Visual(ISLAND_MAP, img_step=1, step=5, ymax=100, blit=True)
+    visual.setup(0, 5)
+    visual.draw(make_snapshot(visual))
+    draw = mocker.spy(visual.fig.canvas, 'draw')
+    visual.draw(make_snapshot(visual))
+    assert draw.call_count == 0
+    visual.draw(make_snapshot(visual, herbs=500))
+    assert draw.call_count == 1
+
+
+def test_blit_above_ymax(mocker):
+    """
+    Testing that a population above ymax only raises the limits once, so the figure is not
+    drawn in full every year
+    """
+    visual = Visual(ISLAND_MAP, img_step=1, step=5, ymax=100, blit=True)
+    visual.setup(0, 5)
+    visual.draw(make_snapshot(visual, herbs=500))
+    draw = mocker.spy(visual.fig.canvas, 'draw')
+    for herbs in (510, 520, 530):
+        visual.draw(make_snapshot(visual, herbs=herbs))
+    assert draw.call_count == 0
+    assert visual.graph_ax.get_ylim()[1] == 600
+
+
+def test_blit_shows_window(mocker):
+    """
+    Testing that the window is shown with blit when the backend draws in a window
+    """
+    mocker.patch('biosim.visuals.interactive_backend', return_value=True)
+    show = mocker.patch('matplotlib.pyplot.show')
+    visual = Visual(ISLAND_MAP, img_step=1, step=5, ymax=100, blit=True)
+    visual.setup(0, 5)
+    show.assert_called_once_with(block=False)
+
+
+def test_blit_saves_images(tmp_path):
+    """
+    Testing that the images are saved with blit
+    """
+    sim = BioSim(ISLAND_MAP, INI_POP, seed=1, vis_years=1, img_dir=str(tmp_path),
+                 img_base='dv', blit=True)
+    sim.simulate(3)
+    assert len(list(tmp_path.iterdir())) == 3
+
+
+def test_movie_writer(tmp_path, mocker):
+    """
+    Testing that the frames are piped to ffmpeg while simulating, without image files
+    """
+    popen = mocker.patch('subprocess.Popen')
+    popen.return_value.wait.return_value = 0
+    sim = BioSim(ISLAND_MAP, INI_POP, seed=1, vis_years=1, img_years=2,
+                 movie_file=str(tmp_path / 'movie.mp4'))
+    sim.simulate(4)
+    args = popen.call_args.args[0]
+    assert args[0] == 'ffmpeg' and args[-1] == str(tmp_path / 'movie.mp4')
+    assert 'rawvideo' in args
+    width, height = args[args.index('-s') + 1].split('x')
+    frames = popen.return_value.stdin.write.call_args_list
+    assert len(frames) == 2
+    assert all(len(frame.args[0]) == int(width) * int(height) * 4 for frame in frames)
+    sim.make_movie()
+    popen.return_value.stdin.close.assert_called_once()
+    assert list(tmp_path.iterdir()) == []
+    sim.close()
+
+
+def test_movie_writer_failed(mocker):
+    """
+    Testing that an error is raised if ffmpeg fails
+    """
+    popen = mocker.patch('subprocess.Popen')
+    popen.return_value.wait.return_value = 1
+    visual = Visual(ISLAND_MAP, img_step=1, step=1, ymax=100, movie_file='movie.mp4')
+    visual.setup(0, 1)
+    visual.save_plot()
+    with pytest.raises(RuntimeError):
+        visual.close_movie()
+
+
+def test_movie_writer_formats(mocker):
+    """
+    Testing that the H.264 options are only used for mp4, and that unknown formats are
+    rejected
+    """
+    popen = mocker.patch('subprocess.Popen')
+    visual = Visual(ISLAND_MAP, img_step=1, step=1, ymax=100, movie_file='movie.gif')
+    visual.setup(0, 1)
+    visual.save_plot()
+    args = popen.call_args.args[0]
+    assert args[-1] == 'movie.gif' and '-profile:v' not in args
+    with pytest.raises(ValueError):
+        Visual(ISLAND_MAP, img_step=1, step=1, ymax=100, movie_file='movie.avi').setup(0, 1)